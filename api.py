@@ -0,0 +1,414 @@
+"""
+Request handling shared by the Flask (WSGI) and ASGI apps.
+Each handler takes already-parsed input and returns a tuple of
+(JSON-serializable payload, HTTP status code).
+"""
+import uuid
+from datetime import datetime
+
+
+def api_info():
+    """
+    Describe the API and its endpoints.
+
+    Returns:
+        Tuple of (payload, status)
+    """
+    return {
+        'api': 'Hello World API',
+        'version': '1.0',
+        'endpoints': {
+            '/': 'API information',
+            '/hello': 'Returns hello world message',
+            '/login': 'Login with username and password (POST)',
+            '/welcome': 'Welcome page (HTML)',
+            '/printer': 'Printer configuration UI (HTML)',
+            '/printer/profiles': 'Printer profiles API',
+            '/printer/presets': 'Job-specific presets API',
+            '/printer/resolve': 'Effective settings for a profile and preset (POST)'
+        }
+    }, 200
+
+
+def hello():
+    """
+    Build the hello world message.
+
+    Returns:
+        Tuple of (payload, status)
+    """
+    return {
+        'message': 'Hello World!',
+        'status': 'success'
+    }, 200
+
+
+def login(data):
+    """
+    Validate a username and password.
+
+    Args:
+        data (dict): Parsed JSON body, or None
+
+    Returns:
+        Tuple of (payload, status)
+    """
+    if not data:
+        return {
+            'status': 'error',
+            'message': 'No data provided'
+        }, 400
+
+    username = data.get('username')
+    password = data.get('password')
+
+    if not username or not password:
+        return {
+            'status': 'error',
+            'message': 'Username and password are required'
+        }, 400
+
+    # Simple validation (in production, this should check against a database)
+    return {
+        'status': 'success',
+        'message': 'Login successful',
+        'username': username
+    }, 200
+
+
+def list_profiles(store):
+    """
+    List all printer profiles.
+
+    Args:
+        store (PrinterStore): The printer store
+
+    Returns:
+        Tuple of (payload, status)
+    """
+    return {
+        'status': 'success',
+        'profiles': [_public_profile(profile) for profile in store.profiles.values()]
+    }, 200
+
+
+def create_profile(store, data):
+    """
+    Create a new printer profile.
+
+    Args:
+        store (PrinterStore): The printer store
+        data (dict): Parsed JSON body, or None
+
+    Returns:
+        Tuple of (payload, status)
+    """
+    if not data:
+        return {
+            'status': 'error',
+            'message': 'No data provided'
+        }, 400
+
+    if not data.get('name'):
+        return {
+            'status': 'error',
+            'message': 'Profile name is required'
+        }, 400
+
+    profile_id = str(uuid.uuid4())
+    # Only the settings the client chose are stored, so a preset resolved
+    # with this profile still supplies the rest
+    profile = {
+        'id': profile_id,
+        'name': data.get('name'),
+        **{field: data[field] for field in _setting_fields() if data.get(field) is not None},
+        'is_favorite': data.get('is_favorite', False),
+        'created_at': datetime.now().isoformat()
+    }
+
+    try:
+        store.put('profile', profile_id, profile)
+    except _event_too_large():
+        return _profile_too_large()
+
+    return {
+        'status': 'success',
+        'message': 'Profile created successfully',
+        'profile': _public_profile(profile)
+    }, 201
+
+
+def _setting_fields():
+    # Imported on first use, like the resolver itself, to keep startup cheap
+    from resolve import SETTING_FIELDS
+    return SETTING_FIELDS
+
+
+def _profile_fields():
+    # Profile fields a client may change with an update
+    return ('name', *_setting_fields(), 'is_favorite')
+
+
+def _public_profile(profile):
+    # Stored profiles hold only the settings a client set. Clients see the
+    # global default for the rest, listed under 'inherited' since a preset
+    # resolved with the profile replaces them.
+    from resolve import GLOBAL_DEFAULTS
+    return {
+        **GLOBAL_DEFAULTS,
+        **profile,
+        'inherited': [field for field in _setting_fields() if field not in profile]
+    }
+
+
+def _event_too_large():
+    # Imported on first use; the store has loaded it by the time put() fails
+    from invalidation import EventTooLarge
+    return EventTooLarge
+
+
+def _profile_too_large():
+    # store.put raises EventTooLarge before storing anything
+    return {
+        'status': 'error',
+        'message': 'Profile is too large'
+    }, 413
+
+
+def update_profile(store, profile_id, data):
+    """
+    Update an existing printer profile. Setting a printer setting to null
+    clears it, so the profile inherits it again.
+
+    Args:
+        store (PrinterStore): The printer store
+        profile_id (str): The profile ID
+        data (dict): Parsed JSON body, or None
+
+    Returns:
+        Tuple of (payload, status)
+    """
+    if profile_id not in store.profiles:
+        return {
+            'status': 'error',
+            'message': 'Profile not found'
+        }, 404
+
+    if not data:
+        return {
+            'status': 'error',
+            'message': 'No data provided'
+        }, 400
+
+    # Update only provided fields, on a copy so readers never see a
+    # half-updated profile
+    settings = _setting_fields()
+    profile = dict(store.profiles[profile_id])
+    for field in _profile_fields():
+        if field not in data:
+            continue
+        if data[field] is None and field in settings:
+            profile.pop(field, None)
+        else:
+            profile[field] = data[field]
+    profile['updated_at'] = datetime.now().isoformat()
+
+    try:
+        store.put('profile', profile_id, profile)
+    except _event_too_large():
+        return _profile_too_large()
+
+    return {
+        'status': 'success',
+        'message': 'Profile updated successfully',
+        'profile': _public_profile(profile)
+    }, 200
+
+
+def delete_profile(store, profile_id):
+    """
+    Delete a printer profile.
+
+    Args:
+        store (PrinterStore): The printer store
+        profile_id (str): The profile ID
+
+    Returns:
+        Tuple of (payload, status)
+    """
+    if profile_id not in store.profiles:
+        return {
+            'status': 'error',
+            'message': 'Profile not found'
+        }, 404
+
+    if profile_id == 'default':
+        return {
+            'status': 'error',
+            'message': 'Cannot delete default profile'
+        }, 400
+
+    store.delete('profile', profile_id)
+
+    return {
+        'status': 'success',
+        'message': 'Profile deleted successfully'
+    }, 200
+
+
+def list_presets(store):
+    """
+    List the job-specific presets.
+
+    Args:
+        store (PrinterStore): The printer store
+
+    Returns:
+        Tuple of (payload, status)
+    """
+    return {
+        'status': 'success',
+        'presets': store.presets
+    }, 200
+
+
+def preview(data, resolver=None):
+    """
+    Generate a print preview based on provided settings.
+
+    When the body names a profile_id and/or preset_id, the preview starts
+    from their resolved settings and the other fields act as overrides.
+
+    Args:
+        data (dict): Parsed JSON body with printer settings, or None
+        resolver (SettingsResolver): Resolver for profile and preset ids
+
+    Returns:
+        Tuple of (payload, status)
+    """
+    if not data:
+        return {
+            'status': 'error',
+            'message': 'No data provided'
+        }, 400
+
+    if not isinstance(data, dict):
+        return _not_an_object()
+
+    if resolver is not None and (data.get('profile_id') or data.get('preset_id')):
+        overrides = {field: data[field] for field in _setting_fields() if field in data}
+        result, status = _resolve_one(resolver, data.get('profile_id'), data.get('preset_id'), overrides)
+        if status != 200:
+            return result, status
+        data = result['settings']
+
+    return {
+        'status': 'success',
+        'preview': {
+            'paper_size': data.get('paper_size', 'Letter'),
+            'orientation': data.get('orientation', 'Portrait'),
+            'color_mode': data.get('color_mode', 'Color'),
+            'quality': data.get('quality', 'Standard'),
+            'duplex': data.get('duplex', False),
+            'copies': data.get('copies', 1),
+            'estimated_pages': 1,
+            'preview_text': 'This is a preview of how your document will be printed with the selected settings.'
+        }
+    }, 200
+
+
+def resolve_settings(resolver, data):
+    """
+    Resolve effective settings for one (profile, preset) pair, or for many.
+
+    Expects either a single request:
+        profile_id (str): Printer profile, optional
+        preset_id (str): Job preset, optional
+        overrides (dict): Settings applied last, optional
+    or a bulk request:
+        items (list): Single requests as above
+
+    Args:
+        resolver (SettingsResolver): The settings resolver
+        data (dict): Parsed JSON body, or None
+
+    Returns:
+        Tuple of (payload, status). Bulk requests report errors per item,
+        each result carrying the status_code it would have had alone.
+    """
+    if not data:
+        return {
+            'status': 'error',
+            'message': 'No data provided'
+        }, 400
+
+    if not isinstance(data, dict):
+        return _not_an_object()
+
+    if 'items' in data:
+        items = data['items']
+        if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            return {
+                'status': 'error',
+                'message': 'items must be a list of objects'
+            }, 400
+        results = []
+        for item in items:
+            result, status = _resolve_one(resolver, item.get('profile_id'), item.get('preset_id'),
+                                          item.get('overrides'))
+            # The HTTP status this item would have had on its own
+            results.append({**result, 'status_code': status})
+        return {
+            'status': 'success',
+            'results': results
+        }, 200
+
+    return _resolve_one(resolver, data.get('profile_id'), data.get('preset_id'), data.get('overrides'))
+
+
+def _not_an_object():
+    return {
+        'status': 'error',
+        'message': 'Request body must be a JSON object'
+    }, 400
+
+
+def _resolve_one(resolver, profile_id, preset_id, overrides):
+    from resolve import SETTING_FIELDS, ResolveError
+    if not all(isinstance(value, (str, type(None))) for value in (profile_id, preset_id)):
+        return {
+            'status': 'error',
+            'message': 'profile_id and preset_id must be strings'
+        }, 400
+    overrides = overrides or {}
+    if not isinstance(overrides, dict):
+        return {
+            'status': 'error',
+            'message': 'overrides must be an object'
+        }, 400
+    unknown = sorted(set(overrides) - set(SETTING_FIELDS))
+    if unknown:
+        return {
+            'status': 'error',
+            'message': f"Unknown setting: {', '.join(unknown)}"
+        }, 400
+    if any(isinstance(value, (dict, list)) for value in overrides.values()):
+        return {
+            'status': 'error',
+            'message': 'Setting values must be plain values'
+        }, 400
+
+    try:
+        settings = resolver.resolve(profile_id, preset_id, overrides)
+    except ResolveError as e:
+        return {
+            'status': 'error',
+            'message': str(e)
+        }, 404
+
+    return {
+        'status': 'success',
+        'profile_id': profile_id,
+        'preset_id': preset_id,
+        'settings': settings
+    }, 200
@@ -1,63 +1,124 @@
 """
 Hello World API using Flask. This is a test.
 A simple REST API that returns a hello world message.
+
+Build an app with create_app(); `app` at module level is a default instance
+created on first access, for `flask run`, gunicorn and the tests.
 """
 import os
-import uuid
-from datetime import datetime
-from flask import Flask, jsonify, request, render_template
-
-app = Flask(__name__)
-
-# In-memory storage for printer profiles
-printer_profiles = {
-    'default': {
-        'id': 'default',
-        'name': 'Default Profile',
-        'paper_size': 'Letter',
-        'orientation': 'Portrait',
-        'color_mode': 'Color',
-        'quality': 'Standard',
-        'duplex': False,
-        'copies': 1,
-        'is_favorite': True,
-        'created_at': datetime.now().isoformat()
-    }
-}
-
-# Job-specific presets
-job_presets = {
-    'draft_documents': {
-        'name': 'Draft Documents',
-        'paper_size': 'Letter',
-        'orientation': 'Portrait',
-        'color_mode': 'Grayscale',
-        'quality': 'Draft',
-        'duplex': True,
-        'copies': 1
-    },
-    'photo_quality': {
-        'name': 'Photo Quality',
-        'paper_size': 'Photo 4x6',
-        'orientation': 'Landscape',
-        'color_mode': 'Color',
-        'quality': 'High',
-        'duplex': False,
-        'copies': 1
-    },
-    'text_heavy': {
-        'name': 'Text Heavy',
-        'paper_size': 'Letter',
-        'orientation': 'Portrait',
-        'color_mode': 'Grayscale',
-        'quality': 'Standard',
-        'duplex': True,
-        'copies': 1
-    }
-}
-
-
-@app.route('/hello', methods=['GET'])
+import threading
+from flask import Blueprint, Flask, Response, current_app, jsonify, request
+import api
+
+# Route groups, registered on each app by create_app()
+hello_bp = Blueprint('hello', __name__)
+printer_ui_bp = Blueprint('printer_ui', __name__)
+profiles_bp = Blueprint('profiles', __name__)
+preview_bp = Blueprint('preview', __name__)
+
+# Guards the first-use creation of per-app subsystems
+_init_lock = threading.Lock()
+
+
+def create_app(config=None, store=None):
+    """
+    Create and configure the Flask app.
+
+    The printer store and the asset pipeline are created on first use, so
+    building an app stays cheap for workers, tests and CLI commands.
+
+    Args:
+        config (dict): Settings merged into app.config. INVALIDATION_BUS
+            selects the bus of a store created on first use.
+        store (PrinterStore): Store to serve from instead of a new one
+
+    Returns:
+        Flask app
+    """
+    app = Flask(__name__)
+    app.config['INVALIDATION_BUS'] = None
+    if config:
+        app.config.update(config)
+    if store is not None:
+        app.extensions['printer_store'] = store
+
+    app.register_blueprint(hello_bp)
+    app.register_blueprint(printer_ui_bp)
+    app.register_blueprint(profiles_bp)
+    app.register_blueprint(preview_bp)
+    return app
+
+
+def get_store():
+    """
+    Get the current app's printer store, creating it on first use.
+
+    Returns:
+        PrinterStore instance
+    """
+    extensions = current_app.extensions
+    if 'printer_store' not in extensions:
+        with _init_lock:
+            if 'printer_store' not in extensions:
+                from invalidation import create_bus
+                from store import PrinterStore
+                # Replicas share profile and preset changes over the invalidation bus
+                bus = create_bus(current_app.config['INVALIDATION_BUS'])
+                extensions['printer_store'] = PrinterStore(bus=bus)
+    return extensions['printer_store']
+
+
+def get_assets():
+    """
+    Get the current app's asset pipeline, creating it on first use.
+
+    Returns:
+        AssetPipeline instance
+    """
+    extensions = current_app.extensions
+    if 'assets' not in extensions:
+        with _init_lock:
+            if 'assets' not in extensions:
+                from assets import AssetPipeline
+                # HTML pages and their hashed CSS/JS, built and compressed once
+                templates = os.path.join(current_app.root_path, current_app.template_folder)
+                extensions['assets'] = AssetPipeline(templates)
+    return extensions['assets']
+
+
+def get_resolver():
+    """
+    Get the current app's settings resolver, creating it on first use.
+
+    Returns:
+        SettingsResolver instance
+    """
+    extensions = current_app.extensions
+    if 'settings_resolver' not in extensions:
+        store = get_store()
+        with _init_lock:
+            if 'settings_resolver' not in extensions:
+                from resolve import SettingsResolver
+                extensions['settings_resolver'] = SettingsResolver(store)
+    return extensions['settings_resolver']
+
+
+def asset_response(asset):
+    """
+    Serve a built page or asset, honoring Accept-Encoding and If-None-Match.
+
+    Args:
+        asset (Asset): The built file
+
+    Returns:
+        Flask response
+    """
+    status, headers, body = asset.respond(request.headers.get('Accept-Encoding', ''),
+                                          request.headers.get('If-None-Match', ''))
+    return Response(body, status, headers)
+
+
+@hello_bp.route('/hello', methods=['GET'])
 def hello_world():
     """
     Returns a hello world message.
@@ -65,13 +126,11 @@ def hello_world():
     Returns:
         JSON response with a hello world message
     """
-    return jsonify({
-        'message': 'Hello World!',
-        'status': 'success'
-    })
+    payload, status = api.hello()
+    return jsonify(payload), status
 
 
-@app.route('/', methods=['GET'])
+@hello_bp.route('/', methods=['GET'])
 def home():
     """
     Home endpoint that provides API information.
@@ -79,22 +138,11 @@ def home():
     Returns:
         JSON response with API information
     """
-    return jsonify({
-        'api': 'Hello World API',
-        'version': '1.0',
-        'endpoints': {
-            '/': 'API information',
-            '/hello': 'Returns hello world message',
-            '/login': 'Login with username and password (POST)',
-            '/welcome': 'Welcome page (HTML)',
-            '/printer': 'Printer configuration UI (HTML)',
-            '/printer/profiles': 'Printer profiles API',
-            '/printer/presets': 'Job-specific presets API'
-        }
-    })
-
-
-@app.route('/login', methods=['POST'])
+    payload, status = api.api_info()
+    return jsonify(payload), status
+
+
+@hello_bp.route('/login', methods=['POST'])
 def login():
     """
     Login endpoint that validates username and password.
@@ -106,32 +154,11 @@ def login():
     Returns:
         JSON response with login status
     """
-    data = request.get_json(silent=True)
-    
-    if not data:
-        return jsonify({
-            'status': 'error',
-            'message': 'No data provided'
-        }), 400
-    
-    username = data.get('username')
-    password = data.get('password')
-    
-    if not username or not password:
-        return jsonify({
-            'status': 'error',
-            'message': 'Username and password are required'
-        }), 400
-    
-    # Simple validation (in production, this should check against a database)
-    return jsonify({
-        'status': 'success',
-        'message': 'Login successful',
-        'username': username
-    }), 200
+    payload, status = api.login(request.get_json(silent=True))
+    return jsonify(payload), status
 
 
-@app.route('/welcome', methods=['GET'])
+@hello_bp.route('/welcome', methods=['GET'])
 def welcome():
     """
     Welcome page that provides a friendly introduction to the API.
@@ -139,10 +166,10 @@ def welcome():
     Returns:
         HTML page with welcome message and API information
     """
-    return render_template('welcome.html')
+    return asset_response(get_assets().page('welcome.html'))
 
 
-@app.route('/printer', methods=['GET'])
+@printer_ui_bp.route('/printer', methods=['GET'])
 def printer_config():
     """
     Printer configuration UI page.
@@ -150,10 +177,30 @@ def printer_config():
     Returns:
         HTML page with printer configuration interface
     """
-    return render_template('printer_config.html')
+    return asset_response(get_assets().page('printer_config.html'))
 
 
-@app.route('/printer/profiles', methods=['GET'])
+@printer_ui_bp.route('/assets/<filename>', methods=['GET'])
+def static_asset(filename):
+    """
+    Content-hashed CSS and JS extracted from the HTML pages.
+    
+    Args:
+        filename (str): Asset file name, including its hash
+    
+    Returns:
+        The asset, cacheable forever, or a JSON error if it does not exist
+    """
+    asset = get_assets().asset(filename)
+    if asset is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Asset not found'
+        }), 404
+    return asset_response(asset)
+
+
+@profiles_bp.route('/printer/profiles', methods=['GET'])
 def get_printer_profiles():
     """
     Get all printer profiles.
@@ -161,14 +208,11 @@ def get_printer_profiles():
     Returns:
         JSON response with list of printer profiles
     """
-    profiles_list = list(printer_profiles.values())
-    return jsonify({
-        'status': 'success',
-        'profiles': profiles_list
-    }), 200
+    payload, status = api.list_profiles(get_store())
+    return jsonify(payload), status
 
 
-@app.route('/printer/profiles', methods=['POST'])
+@profiles_bp.route('/printer/profiles', methods=['POST'])
 def create_printer_profile():
     """
     Create a new printer profile.
@@ -186,44 +230,11 @@ def create_printer_profile():
     Returns:
         JSON response with created profile
     """
-    data = request.get_json(silent=True)
-    
-    if not data:
-        return jsonify({
-            'status': 'error',
-            'message': 'No data provided'
-        }), 400
-    
-    if not data.get('name'):
-        return jsonify({
-            'status': 'error',
-            'message': 'Profile name is required'
-        }), 400
-    
-    profile_id = str(uuid.uuid4())
-    profile = {
-        'id': profile_id,
-        'name': data.get('name'),
-        'paper_size': data.get('paper_size', 'Letter'),
-        'orientation': data.get('orientation', 'Portrait'),
-        'color_mode': data.get('color_mode', 'Color'),
-        'quality': data.get('quality', 'Standard'),
-        'duplex': data.get('duplex', False),
-        'copies': data.get('copies', 1),
-        'is_favorite': data.get('is_favorite', False),
-        'created_at': datetime.now().isoformat()
-    }
-    
-    printer_profiles[profile_id] = profile
-    
-    return jsonify({
-        'status': 'success',
-        'message': 'Profile created successfully',
-        'profile': profile
-    }), 201
+    payload, status = api.create_profile(get_store(), request.get_json(silent=True))
+    return jsonify(payload), status
 
 
-@app.route('/printer/profiles/<profile_id>', methods=['PUT'])
+@profiles_bp.route('/printer/profiles/<profile_id>', methods=['PUT'])
 def update_printer_profile(profile_id):
     """
     Update an existing printer profile.
@@ -234,50 +245,11 @@ def update_printer_profile(profile_id):
     Returns:
         JSON response with updated profile
     """
-    if profile_id not in printer_profiles:
-        return jsonify({
-            'status': 'error',
-            'message': 'Profile not found'
-        }), 404
-    
-    data = request.get_json(silent=True)
-    
-    if not data:
-        return jsonify({
-            'status': 'error',
-            'message': 'No data provided'
-        }), 400
-    
-    profile = printer_profiles[profile_id]
-    
-    # Update only provided fields
-    if 'name' in data:
-        profile['name'] = data['name']
-    if 'paper_size' in data:
-        profile['paper_size'] = data['paper_size']
-    if 'orientation' in data:
-        profile['orientation'] = data['orientation']
-    if 'color_mode' in data:
-        profile['color_mode'] = data['color_mode']
-    if 'quality' in data:
-        profile['quality'] = data['quality']
-    if 'duplex' in data:
-        profile['duplex'] = data['duplex']
-    if 'copies' in data:
-        profile['copies'] = data['copies']
-    if 'is_favorite' in data:
-        profile['is_favorite'] = data['is_favorite']
-    
-    profile['updated_at'] = datetime.now().isoformat()
-    
-    return jsonify({
-        'status': 'success',
-        'message': 'Profile updated successfully',
-        'profile': profile
-    }), 200
+    payload, status = api.update_profile(get_store(), profile_id, request.get_json(silent=True))
+    return jsonify(payload), status
 
 
-@app.route('/printer/profiles/<profile_id>', methods=['DELETE'])
+@profiles_bp.route('/printer/profiles/<profile_id>', methods=['DELETE'])
 def delete_printer_profile(profile_id):
     """
     Delete a printer profile.
@@ -288,27 +260,11 @@ def delete_printer_profile(profile_id):
     Returns:
         JSON response with deletion status
     """
-    if profile_id not in printer_profiles:
-        return jsonify({
-            'status': 'error',
-            'message': 'Profile not found'
-        }), 404
-    
-    if profile_id == 'default':
-        return jsonify({
-            'status': 'error',
-            'message': 'Cannot delete default profile'
-        }), 400
-    
-    del printer_profiles[profile_id]
-    
-    return jsonify({
-        'status': 'success',
-        'message': 'Profile deleted successfully'
-    }), 200
+    payload, status = api.delete_profile(get_store(), profile_id)
+    return jsonify(payload), status
 
 
-@app.route('/printer/presets', methods=['GET'])
+@profiles_bp.route('/printer/presets', methods=['GET'])
 def get_printer_presets():
     """
     Get job-specific presets.
@@ -316,47 +272,69 @@ def get_printer_presets():
     Returns:
         JSON response with available presets
     """
-    return jsonify({
-        'status': 'success',
-        'presets': job_presets
-    }), 200
+    payload, status = api.list_presets(get_store())
+    return jsonify(payload), status
 
 
-@app.route('/printer/preview', methods=['POST'])
+@preview_bp.route('/printer/preview', methods=['POST'])
 def generate_print_preview():
     """
     Generate a print preview based on provided settings.
     
-    Expects JSON body with printer settings.
+    Expects JSON body with printer settings, optionally naming a
+    profile_id and/or preset_id to start from.
     
     Returns:
         JSON response with preview information
     """
-    data = request.get_json(silent=True)
-    
-    if not data:
-        return jsonify({
-            'status': 'error',
-            'message': 'No data provided'
-        }), 400
+    payload, status = api.preview(request.get_json(silent=True), get_resolver())
+    return jsonify(payload), status
+
+
+@preview_bp.route('/printer/resolve', methods=['POST'])
+def resolve_printer_settings():
+    """
+    Resolve effective settings from global defaults, a preset, a profile
+    and per-request overrides, in that order.
     
-    preview = {
-        'status': 'success',
-        'preview': {
-            'paper_size': data.get('paper_size', 'Letter'),
-            'orientation': data.get('orientation', 'Portrait'),
-            'color_mode': data.get('color_mode', 'Color'),
-            'quality': data.get('quality', 'Standard'),
-            'duplex': data.get('duplex', False),
-            'copies': data.get('copies', 1),
-            'estimated_pages': 1,
-            'preview_text': 'This is a preview of how your document will be printed with the selected settings.'
-        }
-    }
+    Expects JSON body with:
+        profile_id (str): Printer profile, optional
+        preset_id (str): Job preset, optional
+        overrides (dict): Settings applied last, optional
+    or, to resolve many pairs in one call:
+        items (list): Objects with the fields above
     
-    return jsonify(preview), 200
+    Returns:
+        JSON response with the effective settings
+    """
+    payload, status = api.resolve_settings(get_resolver(), request.get_json(silent=True))
+    return jsonify(payload), status
+
+
+_default_app = None
+
+
+def __getattr__(name):
+    """
+    Create the default app, and its store, on first access to `app`,
+    `store`, `printer_profiles` or `job_presets`.
+    """
+    global _default_app
+    if name not in ('app', 'store', 'printer_profiles', 'job_presets'):
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    if _default_app is None:
+        with _init_lock:
+            if _default_app is None:
+                _default_app = create_app()
+    if name == 'app':
+        return _default_app
+    with _default_app.app_context():
+        store = get_store()
+    if name == 'store':
+        return store
+    return store.profiles if name == 'printer_profiles' else store.presets
 
 
 if __name__ == '__main__':
     debug_mode = os.environ.get('FLASK_DEBUG', 'False').lower() == 'true'
-    app.run(debug=debug_mode, host='0.0.0.0', port=5000)
+    create_app().run(debug=debug_mode, host='0.0.0.0', port=5000)
@@ -0,0 +1,179 @@
+"""
+ASGI variant of the Hello World API using Starlette.
+Serves the same routes as app.py with async handlers, so slow clients
+hold a coroutine rather than a worker thread.
+
+Handlers that may block (profile changes, which publish on the
+invalidation bus, and building pages) run in a thread pool so they never
+stall the event loop.
+
+Build an app with create_asgi_app(); `app` at module level is a default
+instance created on first access. Run with:
+    uvicorn asgi:app --host 0.0.0.0 --port 8080
+"""
+import contextlib
+import json
+import os
+import threading
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+import api
+from assets import AssetPipeline
+from invalidation import create_bus
+from resolve import SettingsResolver
+from store import PrinterStore
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+
+
+async def get_json(request):
+    """
+    Parse a JSON request body the way Flask's get_json(silent=True) does.
+
+    Returns:
+        Parsed body, or None if it is missing, not JSON or malformed
+    """
+    mimetype = request.headers.get('content-type', '').split(';')[0].strip().lower()
+    if mimetype != 'application/json' and not (mimetype.startswith('application/')
+                                               and mimetype.endswith('+json')):
+        return None
+    try:
+        return json.loads(await request.body())
+    except ValueError:
+        return None
+
+
+def respond(result):
+    """
+    Turn a (payload, status) tuple from api into a JSON response.
+    """
+    payload, status = result
+    return JSONResponse(payload, status_code=status)
+
+
+def asset_response(request, asset):
+    """
+    Serve a built page or asset, honoring Accept-Encoding and If-None-Match.
+    """
+    status, headers, body = asset.respond(request.headers.get('accept-encoding', ''),
+                                          request.headers.get('if-none-match', ''))
+    return Response(body, status_code=status, headers=headers)
+
+
+def create_asgi_app(store=None, assets=None):
+    """
+    Build the ASGI app.
+
+    Args:
+        store (PrinterStore): Store to serve from, defaults to a new store
+            attached to the bus named by INVALIDATION_BUS, whose bus is
+            closed when the app shuts down
+        assets (AssetPipeline): Pages and assets, defaults to a pipeline over
+            the templates directory that builds each page on first use
+
+    Returns:
+        Starlette application
+    """
+    owns_store = store is None
+    if owns_store:
+        store = PrinterStore(bus=create_bus())
+    if assets is None:
+        assets = AssetPipeline(TEMPLATES_DIR)
+    resolver = SettingsResolver(store)
+
+    async def hello_world(request):
+        return respond(api.hello())
+
+    async def home(request):
+        return respond(api.api_info())
+
+    async def login(request):
+        return respond(api.login(await get_json(request)))
+
+    async def welcome(request):
+        # The first request builds and compresses the page
+        return asset_response(request, await run_in_threadpool(assets.page, 'welcome.html'))
+
+    async def printer_config(request):
+        return asset_response(request, await run_in_threadpool(assets.page, 'printer_config.html'))
+
+    async def static_asset(request):
+        asset = await run_in_threadpool(assets.asset, request.path_params['filename'])
+        if asset is None:
+            return JSONResponse({
+                'status': 'error',
+                'message': 'Asset not found'
+            }, status_code=404)
+        return asset_response(request, asset)
+
+    async def get_printer_profiles(request):
+        return respond(api.list_profiles(store))
+
+    # Changes publish on the bus, which waits for peers that are behind
+    async def create_printer_profile(request):
+        data = await get_json(request)
+        return respond(await run_in_threadpool(api.create_profile, store, data))
+
+    async def update_printer_profile(request):
+        profile_id = request.path_params['profile_id']
+        data = await get_json(request)
+        return respond(await run_in_threadpool(api.update_profile, store, profile_id, data))
+
+    async def delete_printer_profile(request):
+        profile_id = request.path_params['profile_id']
+        return respond(await run_in_threadpool(api.delete_profile, store, profile_id))
+
+    async def get_printer_presets(request):
+        return respond(api.list_presets(store))
+
+    async def generate_print_preview(request):
+        return respond(api.preview(await get_json(request), resolver))
+
+    async def resolve_printer_settings(request):
+        return respond(api.resolve_settings(resolver, await get_json(request)))
+
+    routes = [
+        Route('/hello', hello_world, methods=['GET']),
+        Route('/', home, methods=['GET']),
+        Route('/login', login, methods=['POST']),
+        Route('/welcome', welcome, methods=['GET']),
+        Route('/printer', printer_config, methods=['GET']),
+        Route('/assets/{filename}', static_asset, methods=['GET']),
+        Route('/printer/profiles', get_printer_profiles, methods=['GET']),
+        Route('/printer/profiles', create_printer_profile, methods=['POST']),
+        Route('/printer/profiles/{profile_id}', update_printer_profile, methods=['PUT']),
+        Route('/printer/profiles/{profile_id}', delete_printer_profile, methods=['DELETE']),
+        Route('/printer/presets', get_printer_presets, methods=['GET']),
+        Route('/printer/preview', generate_print_preview, methods=['POST']),
+        Route('/printer/resolve', resolve_printer_settings, methods=['POST'])
+    ]
+
+    @contextlib.asynccontextmanager
+    async def lifespan(asgi_app):
+        yield
+        if owns_store and store.bus is not None:
+            store.bus.close()
+
+    asgi_app = Starlette(routes=routes, lifespan=lifespan)
+    asgi_app.state.store = store
+    return asgi_app
+
+
+_default_app = None
+_init_lock = threading.Lock()
+
+
+def __getattr__(name):
+    """
+    Create the default app, and its store and bus, on first access to `app`.
+    """
+    global _default_app
+    if name != 'app':
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    if _default_app is None:
+        with _init_lock:
+            if _default_app is None:
+                _default_app = create_asgi_app()
+    return _default_app
@@ -0,0 +1,259 @@
+"""
+Asset pipeline for the HTML pages.
+Moves inline CSS and JS out of the templates into content-hashed files that
+browsers may cache forever, pre-renders the remaining HTML shells, and
+precompresses everything once at startup.
+
+Usage:
+    python assets.py OUTPUT_DIR
+
+writes the built files, with .gz and .br variants, for serving from a CDN
+or a front-end web server.
+"""
+import gzip
+import hashlib
+import os
+import re
+import sys
+import textwrap
+import threading
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; gzip is always available
+    brotli = None
+
+# Hashed assets never change under the same name
+IMMUTABLE = 'public, max-age=31536000, immutable'
+# Pages keep their URL, so browsers revalidate them with the ETag
+REVALIDATE = 'no-cache'
+
+STYLE_BLOCK = re.compile(r'[ \t]*<style>(.*?)</style>[ \t]*\n?', re.DOTALL)
+SCRIPT_BLOCK = re.compile(r'[ \t]*<script>(.*?)</script>[ \t]*\n?', re.DOTALL)
+
+
+class Asset:
+    """
+    A built file held in memory with its precompressed variants.
+
+    Args:
+        body (bytes): Uncompressed contents
+        content_type (str): Value of the Content-Type header
+        cache_control (str): Value of the Cache-Control header
+    """
+
+    def __init__(self, body, content_type, cache_control):
+        self.body = body
+        self.content_type = content_type
+        self.cache_control = cache_control
+        self.digest = hashlib.sha256(body).hexdigest()
+        self.etag = self.etag_for(None)
+        self.encodings = {}
+        compressed = {'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            compressed['br'] = brotli.compress(body)
+        for encoding, data in compressed.items():
+            if len(data) < len(body):
+                self.encodings[encoding] = data
+
+    def etag_for(self, encoding):
+        """
+        Get the strong ETag of one content-coding of this file. Each coding
+        is a different sequence of bytes, so each gets its own tag.
+
+        Args:
+            encoding (str): 'gzip', 'br', or None for the uncompressed body
+
+        Returns:
+            str quoted entity tag
+        """
+        if encoding is None:
+            return f'"{self.digest[:16]}"'
+        return f'"{self.digest[:16]}-{encoding}"'
+
+    def respond(self, accept_encoding='', if_none_match=''):
+        """
+        Pick the response for a request.
+
+        Args:
+            accept_encoding (str): The request's Accept-Encoding header
+            if_none_match (str): The request's If-None-Match header
+
+        Returns:
+            Tuple of (status, headers dict, body bytes)
+        """
+        encoding = None
+        accepted = accepted_encodings(accept_encoding)
+        for candidate in ('br', 'gzip'):
+            if candidate in accepted and candidate in self.encodings:
+                encoding = candidate
+                break
+        etag = self.etag_for(encoding)
+        headers = {
+            'Content-Type': self.content_type,
+            'Cache-Control': self.cache_control,
+            'ETag': etag,
+            'Vary': 'Accept-Encoding'
+        }
+        if etag_matches(etag, if_none_match):
+            return 304, headers, b''
+        if encoding is None:
+            return 200, headers, self.body
+        headers['Content-Encoding'] = encoding
+        return 200, headers, self.encodings[encoding]
+
+
+def etag_matches(etag, if_none_match):
+    """
+    Check an If-None-Match header against an ETag. Uses the weak comparison
+    If-None-Match calls for, so W/ tags added by proxies that recompress
+    still match, and '*' matches any tag.
+
+    Returns:
+        True if the client's copy is current
+    """
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if tag == '*' or tag.removeprefix('W/') == etag:
+            return True
+    return False
+
+
+def accepted_encodings(header):
+    """
+    Parse an Accept-Encoding header.
+
+    Returns:
+        set of encodings the client accepts
+    """
+    accepted = set()
+    for item in header.split(','):
+        name, _, params = item.strip().partition(';')
+        if params.replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        if name:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+class AssetPipeline:
+    """
+    Builds the HTML pages and their hashed assets from the templates.
+
+    Args:
+        templates_dir (str): Directory holding the page templates
+        url_prefix (str): URL path the hashed assets are served under
+    """
+
+    def __init__(self, templates_dir, url_prefix='/assets'):
+        self.templates_dir = templates_dir
+        self.url_prefix = url_prefix.rstrip('/')
+        self.pages = {}
+        self.assets = {}
+        self._built_all = False
+        # Serializes lazy builds between request threads
+        self._lock = threading.RLock()
+
+    def build(self, names=None):
+        """
+        Build every page in the templates directory.
+
+        Args:
+            names (list): Template file names to build, defaults to all
+                .html files
+
+        Returns:
+            self, so the call can be chained
+        """
+        with self._lock:
+            build_all = names is None
+            if build_all:
+                names = sorted(name for name in os.listdir(self.templates_dir) if name.endswith('.html'))
+            for name in names:
+                with open(os.path.join(self.templates_dir, name), encoding='utf-8') as f:
+                    html = f.read()
+                stem = os.path.splitext(name)[0]
+                html = self._extract(html, STYLE_BLOCK, stem, 'css', 'text/css; charset=utf-8',
+                                     '    <link rel="stylesheet" href="{url}">\n')
+                html = self._extract(html, SCRIPT_BLOCK, stem, 'js', 'text/javascript; charset=utf-8',
+                                     '    <script src="{url}"></script>\n')
+                self.pages[name] = Asset(html.encode('utf-8'), 'text/html; charset=utf-8', REVALIDATE)
+            if build_all:
+                # Only once every asset exists, so asset() never gives up early
+                self._built_all = True
+        return self
+
+    def page(self, name):
+        """
+        Get a built page, building it on first use.
+
+        Args:
+            name (str): Template file name
+
+        Returns:
+            Asset for the page
+        """
+        if name not in self.pages:
+            with self._lock:
+                if name not in self.pages:
+                    self.build([name])
+        return self.pages[name]
+
+    def asset(self, filename):
+        """
+        Get a hashed asset by file name. Builds every page first if the
+        asset is unknown, since a browser may ask for it before this process
+        has served the page that links it.
+
+        Returns:
+            Asset, or None if there is no such file
+        """
+        if filename not in self.assets and not self._built_all:
+            with self._lock:
+                if filename not in self.assets and not self._built_all:
+                    self.build()
+        return self.assets.get(filename)
+
+    def write(self, output_dir):
+        """
+        Write every built file, with its compressed variants, to a directory.
+
+        Args:
+            output_dir (str): Destination directory
+        """
+        files = dict(self.pages)
+        files.update({os.path.join(self.url_prefix.lstrip('/'), name): asset
+                      for name, asset in self.assets.items()})
+        for relative, asset in files.items():
+            path = os.path.join(output_dir, relative)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(asset.body)
+            for encoding, suffix in (('gzip', '.gz'), ('br', '.br')):
+                if encoding in asset.encodings:
+                    with open(path + suffix, 'wb') as f:
+                        f.write(asset.encodings[encoding])
+
+    def _extract(self, html, pattern, stem, extension, content_type, tag):
+        blocks = pattern.findall(html)
+        if not blocks:
+            return html
+        source = '\n'.join(textwrap.dedent(block).strip() for block in blocks) + '\n'
+        asset = Asset(source.encode('utf-8'), content_type, IMMUTABLE)
+        filename = f'{stem}.{asset.digest[:12]}.{extension}'
+        self.assets[filename] = asset
+        link = tag.format(url=f'{self.url_prefix}/{filename}')
+        # The first block becomes the link; any later blocks are dropped
+        parts = pattern.split(html, maxsplit=1)
+        return parts[0] + link + pattern.sub('', parts[2])
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print(__doc__.strip())
+        sys.exit(2)
+    templates = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+    pipeline = AssetPipeline(templates).build()
+    pipeline.write(sys.argv[1])
+    for name in sorted(pipeline.assets):
+        print(f'{pipeline.url_prefix}/{name}')
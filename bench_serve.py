@@ -0,0 +1,123 @@
+"""
+Benchmark comparing the Werkzeug development server with serve.py.
+
+Starts each server in a subprocess, drives it with keep-alive HTTP clients
+for a fixed time and prints requests per second for each endpoint.
+
+Usage:
+    python bench_serve.py [--duration 5] [--clients 32] [--workers 4]
+"""
+import argparse
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+ENDPOINTS = ['/hello', '/printer/profiles', '/printer/presets']
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def free_port():
+    """Ask the OS for an unused TCP port"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(port, timeout=15.0):
+    """Block until the server on the port answers /hello"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/hello')
+            conn.getresponse().read()
+            conn.close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'Server on port {port} did not start')
+
+
+def start_dev_server(port):
+    """Start app.py under the Werkzeug development server"""
+    code = f"from app import app; app.run(host='127.0.0.1', port={port})"
+    return subprocess.Popen([sys.executable, '-c', code], cwd=HERE,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def start_production_server(port, workers, threads):
+    """Start app.py under serve.py"""
+    args = [sys.executable, 'serve.py', '--bind', f'127.0.0.1:{port}',
+            '--workers', str(workers), '--threads', str(threads)]
+    return subprocess.Popen(args, cwd=HERE,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def drive(port, path, duration, clients):
+    """
+    Hammer one endpoint with keep-alive clients.
+
+    Returns:
+        Requests per second across all clients
+    """
+    counts = [0] * clients
+    stop_at = time.monotonic() + duration
+
+    def client(index):
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        while time.monotonic() < stop_at:
+            try:
+                conn.request('GET', path)
+                conn.getresponse().read()
+                counts[index] += 1
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        conn.close()
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / duration
+
+
+def run(process, port, duration, clients):
+    """Benchmark every endpoint on one server, then stop it"""
+    try:
+        wait_until_up(port)
+        return {path: drive(port, path, duration, clients) for path in ENDPOINTS}
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--duration', type=float, default=5.0, help='Seconds per endpoint')
+    parser.add_argument('--clients', type=int, default=32, help='Concurrent keep-alive clients')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='serve.py worker processes')
+    parser.add_argument('--threads', type=int, default=4, help='serve.py threads per worker')
+    args = parser.parse_args(argv)
+
+    port = free_port()
+    dev = run(start_dev_server(port), port, args.duration, args.clients)
+    port = free_port()
+    prod = run(start_production_server(port, args.workers, args.threads),
+               port, args.duration, args.clients)
+
+    print(f'{args.clients} clients, {args.duration:g}s per endpoint, '
+          f'serve.py with {args.workers} workers x {args.threads} threads')
+    print(f"{'endpoint':<20}{'dev req/s':>12}{'serve req/s':>14}{'speedup':>10}")
+    for path in ENDPOINTS:
+        speedup = prod[path] / dev[path] if dev[path] else float('inf')
+        print(f'{path:<20}{dev[path]:>12.0f}{prod[path]:>14.0f}{speedup:>9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Startup benchmark for the Flask app.
+
+Measures, in fresh interpreters, how long it takes to import app.py, build
+an app with create_app() and serve the first request to each route group.
+test_startup.py holds these numbers to STARTUP_BUDGET so cold starts and
+worker respawns stay fast as the app grows.
+
+Usage:
+    python bench_startup.py [--runs 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Seconds allowed for each phase; scale with STARTUP_BUDGET_SCALE on slow machines
+STARTUP_BUDGET = {
+    'import': 1.0,
+    'create_app': 0.1,
+    'first_request': 0.5
+}
+
+# First requests that pull in the lazily created subsystems
+FIRST_REQUESTS = ['/hello', '/printer', '/printer/profiles']
+
+# Modules create_app() must leave for the first request that needs them
+LAZY_MODULES = ['assets', 'invalidation', 'resolve', 'store']
+
+PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+import app as app_module
+imported = time.perf_counter()
+app = app_module.create_app()
+created = time.perf_counter()
+eager = [name for name in %r if name in sys.modules]
+client = app.test_client()
+first = {}
+for path in %r:
+    before = time.perf_counter()
+    client.get(path)
+    first[path] = time.perf_counter() - before
+print(json.dumps({
+    'import': imported - start,
+    'create_app': created - imported,
+    'first_request': first,
+    'eager_modules': eager
+}))
+''' % (LAZY_MODULES, FIRST_REQUESTS)
+
+
+def probe():
+    """
+    Measure one cold start in a fresh interpreter.
+
+    Returns:
+        dict with 'import' and 'create_app' seconds, 'first_request'
+        seconds per path and the LAZY_MODULES loaded before any request
+    """
+    result = subprocess.run([sys.executable, '-c', PROBE], cwd=HERE,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
+
+
+def measure_startup(runs=3):
+    """
+    Measure several cold starts and keep the median of each phase.
+
+    Args:
+        runs (int): Number of fresh interpreters to measure
+
+    Returns:
+        dict with 'import', 'create_app' and 'first_request' (the slowest
+        route) in seconds
+    """
+    samples = [probe() for _ in range(runs)]
+    return {
+        'import': statistics.median(s['import'] for s in samples),
+        'create_app': statistics.median(s['create_app'] for s in samples),
+        'first_request': statistics.median(max(s['first_request'].values()) for s in samples)
+    }
+
+
+def budget():
+    """
+    Get the startup budget, scaled by STARTUP_BUDGET_SCALE if set.
+
+    Returns:
+        dict of seconds allowed per phase
+    """
+    scale = float(os.environ.get('STARTUP_BUDGET_SCALE', 1))
+    return {phase: seconds * scale for phase, seconds in STARTUP_BUDGET.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters to measure')
+    args = parser.parse_args(argv)
+
+    results = measure_startup(args.runs)
+    limits = budget()
+    print(f'median of {args.runs} cold starts')
+    print(f"{'phase':<16}{'ms':>10}{'budget ms':>12}")
+    for phase, seconds in results.items():
+        print(f'{phase:<16}{seconds * 1000:>10.1f}{limits[phase] * 1000:>12.0f}')
+
+
+if __name__ == '__main__':
+    main()
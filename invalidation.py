@@ -0,0 +1,358 @@
+"""
+Invalidation bus for keeping replica read caches coherent.
+Each node publishes version-stamped change events after a mutation and
+applies the events it receives from its peers to local memory.
+"""
+import copy
+import json
+import logging
+import os
+import socket
+import struct
+import threading
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Each frame on the Unix socket bus is a 4-byte length, then the JSON event
+FRAME_HEADER = struct.Struct('!I')
+
+
+class EventTooLarge(ValueError):
+    """Raised when an event is larger than a bus will carry."""
+
+
+class InvalidationBus:
+    """
+    Base class for invalidation bus backends.
+
+    A backend delivers every published event to the subscribers of all
+    other nodes attached to the same channel. Events are plain dicts with
+    the keys: kind, key, op ('put' or 'delete'), value, version, origin.
+    """
+
+    # Largest event, JSON-encoded, that a bus carries
+    max_event_size = 1 << 20
+
+    def __init__(self, node_id=None):
+        self.node_id = node_id or uuid.uuid4().hex
+        self._subscribers = []
+
+    def subscribe(self, callback):
+        """
+        Register a callback invoked with each event received from a peer.
+
+        Args:
+            callback (callable): Function taking a single event dict
+        """
+        self._subscribers.append(callback)
+
+    def publish(self, event, target=None):
+        """
+        Send an event to every peer on the bus, or to one of them.
+
+        Args:
+            event (dict): The change event
+            target (str): Node id of the only peer to send to, optional
+        """
+        raise NotImplementedError
+
+    def check(self, event):
+        """
+        Make sure an event can be published. Call it before applying the
+        change locally, so an event the peers would never receive is
+        rejected rather than leaving this node ahead of them.
+
+        Args:
+            event (dict): The change event
+
+        Raises:
+            EventTooLarge: If the encoded event exceeds max_event_size
+        """
+        size = len(json.dumps(event).encode('utf-8'))
+        if size > self.max_event_size:
+            raise EventTooLarge(f'Event is {size} bytes, the limit is {self.max_event_size}')
+
+    def peers(self):
+        """
+        List the other nodes on the bus.
+
+        Returns:
+            list of node ids
+        """
+        return []
+
+    def close(self):
+        """Detach this node from the bus."""
+
+    def _deliver(self, event):
+        for callback in list(self._subscribers):
+            try:
+                callback(event)
+            except Exception:
+                # One bad event must not stop this node receiving the rest
+                logger.exception('Failed to apply invalidation event %r', event)
+
+
+class LoopbackBus(InvalidationBus):
+    """
+    In-process bus. Every LoopbackBus sharing a channel name receives the
+    events published by the others, synchronously, in the publisher's thread.
+    Without a channel name the bus gets a private channel of its own.
+    """
+
+    _channels = {}
+    _channels_lock = threading.Lock()
+
+    def __init__(self, channel=None, node_id=None):
+        super().__init__(node_id)
+        self.channel = channel or self.node_id
+        with self._channels_lock:
+            self._channels.setdefault(self.channel, []).append(self)
+
+    def peers(self):
+        with self._channels_lock:
+            return [bus.node_id for bus in self._channels.get(self.channel, []) if bus is not self]
+
+    def publish(self, event, target=None):
+        with self._channels_lock:
+            peers = [bus for bus in self._channels.get(self.channel, [])
+                     if bus is not self and target in (None, bus.node_id)]
+        for peer in peers:
+            # Copy so replicas never share mutable profile dicts
+            peer._deliver(copy.deepcopy(event))
+
+    def close(self):
+        with self._channels_lock:
+            members = self._channels.get(self.channel, [])
+            if self in members:
+                members.remove(self)
+
+
+class UnixSocketBus(InvalidationBus):
+    """
+    Bus backed by Unix stream sockets in a shared directory.
+
+    Each node listens on <directory>/<node_id>.sock and publishes by writing
+    the length-prefixed JSON event to a connection to every other socket in
+    the directory, so replicas on the same host converge without an
+    external broker. A write blocks while a peer is behind, for up to
+    send_timeout seconds; a peer that misses an event that way is sent a
+    full replay once resync_delay has passed.
+    """
+
+    send_timeout = 5.0
+    resync_delay = 1.0
+
+    def __init__(self, directory, node_id=None):
+        super().__init__(node_id)
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f'{self.node_id}.sock')
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(self.path)
+        self._server.listen()
+        self._closed = False
+        self._lock = threading.Lock()
+        self._connections = {}
+        self._send_locks = {}
+        self._accepted = set()
+        self._lagging = set()
+        self._thread = threading.Thread(target=self._accept, daemon=True)
+        self._thread.start()
+
+    def peers(self):
+        """
+        List the nodes currently listening in the bus directory.
+
+        Returns:
+            list of node ids, not including this node
+        """
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            # The directory goes away with the server that created it
+            return []
+        return [name[:-len('.sock')] for name in names
+                if name.endswith('.sock') and name != f'{self.node_id}.sock']
+
+    def publish(self, event, target=None):
+        if self._closed:
+            return
+        frame = encode_frame(event)
+        for peer in self.peers() if target is None else [target]:
+            self._send(peer, frame)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        with self._lock:
+            sockets = [self._server, *self._connections.values(), *self._accepted]
+            self._connections.clear()
+        for sock in sockets:
+            try:
+                # Wakes any thread blocked in accept() or recv() on it
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def _send(self, peer, frame):
+        with self._lock:
+            if peer in self._lagging:
+                # The pending replay covers this event
+                return
+            send_lock = self._send_locks.setdefault(peer, threading.Lock())
+        if not send_lock.acquire(timeout=self.send_timeout):
+            self._schedule_resync(peer)
+            return
+        try:
+            connection = self._connections.get(peer)
+            if connection is None:
+                connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                connection.settimeout(self.send_timeout)
+                try:
+                    connection.connect(os.path.join(self.directory, f'{peer}.sock'))
+                except (ConnectionRefusedError, FileNotFoundError):
+                    # Stale socket left behind by a node that went away
+                    connection.close()
+                    self._forget_peer(peer)
+                    return
+                with self._lock:
+                    self._connections[peer] = connection
+            connection.sendall(frame)
+        except OSError:
+            # Timed out or the peer hung up, possibly mid-frame; start over
+            # on a new connection with a full replay
+            self._drop_connection(peer)
+            if not self._closed:
+                self._schedule_resync(peer)
+        finally:
+            send_lock.release()
+
+    def _drop_connection(self, peer):
+        with self._lock:
+            connection = self._connections.pop(peer, None)
+        if connection is not None:
+            connection.close()
+
+    def _forget_peer(self, peer):
+        try:
+            os.unlink(os.path.join(self.directory, f'{peer}.sock'))
+        except FileNotFoundError:
+            pass
+
+    def _schedule_resync(self, peer):
+        with self._lock:
+            if peer in self._lagging:
+                return
+            self._lagging.add(peer)
+        timer = threading.Timer(self.resync_delay, self._resync, [peer])
+        timer.daemon = True
+        timer.start()
+
+    def _resync(self, peer):
+        with self._lock:
+            self._lagging.discard(peer)
+        if not self._closed:
+            # Handled as if the peer had asked: the store replays everything
+            logger.warning('Peer %s fell behind; replaying to it', peer)
+            self._deliver({'op': 'sync', 'origin': peer})
+
+    def _accept(self):
+        while not self._closed:
+            try:
+                connection, _ = self._server.accept()
+            except OSError:
+                break
+            with self._lock:
+                self._accepted.add(connection)
+            threading.Thread(target=self._read, args=(connection,), daemon=True).start()
+
+    def _read(self, connection):
+        try:
+            while not self._closed:
+                header = recv_exactly(connection, FRAME_HEADER.size)
+                if header is None:
+                    break
+                size, = FRAME_HEADER.unpack(header)
+                if size > self.max_event_size:
+                    logger.error('Closing connection sending a %d byte event', size)
+                    break
+                payload = recv_exactly(connection, size)
+                if payload is None:
+                    break
+                try:
+                    event = json.loads(payload.decode('utf-8'))
+                except ValueError:
+                    logger.warning('Ignoring malformed invalidation event')
+                    continue
+                if not isinstance(event, dict):
+                    logger.warning('Ignoring invalidation event that is not an object')
+                    continue
+                self._deliver(event)
+        except OSError:
+            pass
+        finally:
+            with self._lock:
+                self._accepted.discard(connection)
+            connection.close()
+
+
+def encode_frame(event):
+    """
+    Encode an event as a length-prefixed JSON frame.
+
+    Returns:
+        bytes
+    """
+    payload = json.dumps(event).encode('utf-8')
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+
+def recv_exactly(connection, size):
+    """
+    Read exactly size bytes from a stream socket.
+
+    Returns:
+        bytes, or None if the peer closed the connection first
+    """
+    chunks = []
+    while size:
+        chunk = connection.recv(min(size, 1 << 16))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def create_bus(url=None, node_id=None):
+    """
+    Build an invalidation bus from a URL.
+
+    Args:
+        url (str): 'loopback' for a private in-process bus,
+            'loopback://<channel>' for one shared within the process, or
+            'unix://<directory>' for the Unix socket bus. Defaults to the
+            INVALIDATION_BUS environment variable, then 'loopback'.
+        node_id (str): Identifier of this node on the bus
+
+    Returns:
+        InvalidationBus instance
+    """
+    url = url or os.environ.get('INVALIDATION_BUS', 'loopback')
+    if url == 'loopback':
+        return LoopbackBus(node_id=node_id)
+    if url.startswith('loopback://'):
+        return LoopbackBus(channel=url[len('loopback://'):], node_id=node_id)
+    if url.startswith('unix://'):
+        return UnixSocketBus(url[len('unix://'):], node_id=node_id)
+    raise ValueError(f'Unsupported invalidation bus: {url}')
@@ -0,0 +1,137 @@
+"""
+Effective-settings resolution for print jobs.
+Layers global defaults, a job preset, a printer profile and per-request
+overrides (later layers win), and memoizes the result by the version of
+every layer so repeated resolutions are a single dict lookup.
+"""
+import threading
+from collections import OrderedDict
+
+# Settings every job starts from
+GLOBAL_DEFAULTS = {
+    'paper_size': 'Letter',
+    'orientation': 'Portrait',
+    'color_mode': 'Color',
+    'quality': 'Standard',
+    'duplex': False,
+    'copies': 1
+}
+
+# Fields that make up a job's effective settings
+SETTING_FIELDS = tuple(GLOBAL_DEFAULTS)
+
+
+class ResolveError(LookupError):
+    """Raised when a requested profile or preset does not exist."""
+
+
+class SettingsResolver:
+    """
+    Resolves and memoizes effective job settings from a PrinterStore.
+
+    Cache entries are keyed by the version of each layer, so a stale result
+    can never be served, and are evicted as soon as the store reports a
+    change to a profile or preset they were built from.
+
+    Args:
+        store (PrinterStore): Source of profiles and presets
+        defaults (dict): Global defaults, defaults to GLOBAL_DEFAULTS
+        max_entries (int): Most resolved results kept, least recently used
+            are dropped first
+    """
+
+    def __init__(self, store, defaults=None, max_entries=1024):
+        self.store = store
+        self.defaults = dict(defaults if defaults is not None else GLOBAL_DEFAULTS)
+        self.defaults_version = 0
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._dependents = {}
+        self._lock = threading.Lock()
+        store.add_listener(self.invalidate)
+
+    def set_defaults(self, defaults):
+        """
+        Replace the global defaults, dropping every cached result.
+
+        Args:
+            defaults (dict): New global defaults
+        """
+        with self._lock:
+            self.defaults = dict(defaults)
+            self.defaults_version += 1
+            self._cache.clear()
+            self._dependents.clear()
+
+    def resolve(self, profile_id=None, preset_id=None, overrides=None):
+        """
+        Compute the effective settings for a job.
+
+        Args:
+            profile_id (str): Printer profile to apply, optional
+            preset_id (str): Job preset to apply, optional
+            overrides (dict): Per-request settings applied last, optional
+
+        Returns:
+            dict of effective settings
+
+        Raises:
+            ResolveError: If the profile or preset does not exist
+        """
+        if profile_id is not None and profile_id not in self.store.profiles:
+            raise ResolveError('Profile not found')
+        if preset_id is not None and preset_id not in self.store.presets:
+            raise ResolveError('Preset not found')
+        overrides = overrides or {}
+        key = (
+            self.defaults_version,
+            profile_id, self.store.version('profile', profile_id),
+            preset_id, self.store.version('preset', preset_id),
+            # The type is part of the key: True, 1 and 1.0 are equal and
+            # hash alike, but must not share a result
+            tuple(sorted((field, type(value).__name__, value) for field, value in overrides.items()))
+        )
+        with self._lock:
+            settings = self._cache.get(key)
+            if settings is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return dict(settings)
+            self.misses += 1
+
+        settings = dict(self.defaults)
+        for layer in (self.store.presets.get(preset_id), self.store.profiles.get(profile_id), overrides):
+            if layer:
+                settings.update((field, layer[field]) for field in SETTING_FIELDS if field in layer)
+
+        with self._lock:
+            self._cache[key] = settings
+            for dependency in (('profile', profile_id), ('preset', preset_id)):
+                if dependency[1] is not None:
+                    self._dependents.setdefault(dependency, set()).add(key)
+            while len(self._cache) > self.max_entries:
+                self._forget(next(iter(self._cache)))
+        return dict(settings)
+
+    def invalidate(self, kind, key):
+        """
+        Drop every cached result built from one profile or preset.
+
+        Args:
+            kind (str): 'profile' or 'preset'
+            key (str): Entry id
+        """
+        with self._lock:
+            for cache_key in self._dependents.pop((kind, key), ()):
+                self._cache.pop(cache_key, None)
+
+    def _forget(self, cache_key):
+        self._cache.pop(cache_key, None)
+        for dependency in (('profile', cache_key[1]), ('preset', cache_key[3])):
+            dependents = self._dependents.get(dependency)
+            if dependents is not None:
+                dependents.discard(cache_key)
+                if not dependents:
+                    del self._dependents[dependency]
@@ -0,0 +1,257 @@
+"""
+Production server for the Hello World API.
+Runs the Flask app under gunicorn with preforked, threaded workers.
+
+Usage:
+    python serve.py [--bind 0.0.0.0:8080] [--workers 4] [--threads 4]
+
+Every option can also be set through the environment variable shown in
+`python serve.py --help`.
+"""
+import argparse
+import errno
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+
+from gunicorn.app.base import BaseApplication
+from gunicorn.workers.gthread import TConn, ThreadWorker
+
+
+def default_workers():
+    """
+    Default number of worker processes: two per CPU core plus one.
+
+    Returns:
+        int worker count
+    """
+    return multiprocessing.cpu_count() * 2 + 1
+
+
+class RecyclingThreadWorker(ThreadWorker):
+    """
+    gthread worker that recycles without dropping connections.
+
+    The stock worker parks each new connection in its event loop until the
+    request arrives, and closes whatever is still parked when it exits to be
+    recycled, resetting those clients. This worker hands new connections
+    straight to its thread pool, whose requests a recycled worker finishes
+    (within graceful_timeout) before exiting. Idle keep-alive connections
+    still wait in the event loop.
+    """
+
+    def accept(self, server, listener):
+        try:
+            sock, client = listener.accept()
+        except OSError as e:
+            if e.errno not in (errno.EAGAIN, errno.ECONNABORTED, errno.EWOULDBLOCK):
+                raise
+            return
+        conn = TConn(self.cfg, sock, client, server)
+        self.nr_conns += 1
+        conn.init()
+        # A client that connects and sends nothing may hold a thread only
+        # this long
+        conn.sock.settimeout(self.cfg.timeout)
+        self._wrap_future(self.tpool.submit(self.handle, conn), conn)
+
+
+def parse_args(argv=None):
+    """
+    Parse command line options, falling back to environment variables.
+
+    Args:
+        argv (list): Arguments to parse, defaults to sys.argv[1:]
+
+    Returns:
+        argparse.Namespace with the server settings
+    """
+    env = os.environ
+    parser = argparse.ArgumentParser(description='Run the API under gunicorn.')
+    parser.add_argument('--bind', default=env.get('BIND', f"0.0.0.0:{env.get('PORT', '8080')}"),
+                        help='Address to listen on (BIND, or PORT)')
+    parser.add_argument('--workers', type=int, default=int(env.get('WEB_CONCURRENCY', default_workers())),
+                        help='Number of worker processes (WEB_CONCURRENCY)')
+    parser.add_argument('--threads', type=int, default=int(env.get('SERVE_THREADS', 4)),
+                        help='Threads per worker (SERVE_THREADS)')
+    parser.add_argument('--max-requests', type=int, default=int(env.get('SERVE_MAX_REQUESTS', 10000)),
+                        help='Recycle a worker after this many requests, 0 to disable (SERVE_MAX_REQUESTS)')
+    parser.add_argument('--max-requests-jitter', type=int, default=int(env.get('SERVE_MAX_REQUESTS_JITTER', 1000)),
+                        help='Random spread added to --max-requests (SERVE_MAX_REQUESTS_JITTER)')
+    parser.add_argument('--keepalive', type=int, default=int(env.get('SERVE_KEEPALIVE', 5)),
+                        help='Seconds to hold idle keep-alive connections (SERVE_KEEPALIVE)')
+    parser.add_argument('--timeout', type=int, default=int(env.get('SERVE_TIMEOUT', 30)),
+                        help='Seconds before a silent worker is killed (SERVE_TIMEOUT)')
+    parser.add_argument('--graceful-timeout', type=int, default=int(env.get('SERVE_GRACEFUL_TIMEOUT', 30)),
+                        help='Seconds a recycled worker gets to finish requests (SERVE_GRACEFUL_TIMEOUT)')
+    parser.add_argument('--keep-store', metavar='BUS_URL', help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def build_options(args):
+    """
+    Translate parsed arguments into gunicorn settings.
+
+    Args:
+        args (argparse.Namespace): Parsed server settings
+
+    Returns:
+        dict of gunicorn settings
+    """
+    return {
+        'bind': args.bind,
+        'workers': args.workers,
+        'threads': args.threads,
+        'worker_class': RecyclingThreadWorker,
+        # Import the app once in the master so workers share it copy-on-write
+        'preload_app': True,
+        'max_requests': args.max_requests,
+        'max_requests_jitter': args.max_requests_jitter,
+        'keepalive': args.keepalive,
+        'timeout': args.timeout,
+        'graceful_timeout': args.graceful_timeout,
+        'accesslog': None,
+        'errorlog': '-'
+    }
+
+
+def bus_url_for(workers, max_requests=0):
+    """
+    Pick the invalidation bus the workers connect to.
+
+    Workers each hold their own copy of the store, so they need a shared bus,
+    even on a single host, whenever there is more than one of them or a
+    recycled worker has to catch up with the changes made before it
+    started. An explicit INVALIDATION_BUS always wins, as long as it can
+    reach other processes.
+
+    Args:
+        workers (int): Number of worker processes
+        max_requests (int): Requests after which a worker is recycled, 0
+            if workers are never recycled
+
+    Returns:
+        Tuple of the bus URL, or None to keep the in-process default, and
+        the temporary directory created for it, if any
+
+    Raises:
+        ValueError: If INVALIDATION_BUS is an in-process loopback bus but
+            the workers need a shared one
+    """
+    url = os.environ.get('INVALIDATION_BUS')
+    shared = workers > 1 or max_requests > 0
+    if url:
+        if shared and url.startswith('loopback'):
+            raise ValueError(f'INVALIDATION_BUS={url} only reaches its own process; with several '
+                             'workers or worker recycling use a unix:// bus')
+        return url, None
+    if not shared:
+        return None, None
+    directory = tempfile.mkdtemp(prefix='printer-bus-')
+    return 'unix://' + directory, directory
+
+
+def keep_store(bus_url):
+    """
+    Hold a replica of the store on the bus for as long as the server runs.
+
+    Workers keep their state in memory, so without a long-lived peer a burst
+    of recycled workers could all restart from the preloaded defaults.
+
+    Args:
+        bus_url (str): Bus the workers are attached to
+    """
+    from invalidation import create_bus
+    from store import PrinterStore
+    PrinterStore().attach(create_bus(bus_url))
+    threading.Event().wait()
+
+
+def start_store_keeper(bus_url):
+    """
+    Run keep_store in a child process.
+
+    Returns:
+        subprocess.Popen handle for the keeper
+    """
+    return subprocess.Popen([sys.executable, os.path.abspath(__file__), '--keep-store', bus_url])
+
+
+class Server(BaseApplication):
+    """
+    gunicorn application that preloads the app from app.create_app() and
+    gives each forked worker its own connection to the invalidation bus.
+    """
+
+    sync_timeout = 0.5
+
+    def __init__(self, options, bus_url=None, bus_dir=None):
+        self.options = options
+        self.bus_url = bus_url
+        self.bus_dir = bus_dir
+        self.keeper = None
+        self.flask_app = None
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+        self.cfg.set('on_starting', self.on_starting)
+        self.cfg.set('on_exit', self.on_exit)
+        self.cfg.set('post_fork', self.post_fork)
+        self.cfg.set('worker_exit', self.worker_exit)
+
+    def on_starting(self, server):
+        if self.bus_url:
+            self.keeper = start_store_keeper(self.bus_url)
+
+    def on_exit(self, server):
+        if self.keeper is not None:
+            self.keeper.terminate()
+            self.keeper.wait()
+        if self.bus_dir:
+            shutil.rmtree(self.bus_dir, ignore_errors=True)
+
+    def load(self):
+        # The master's app only ever needs a private bus; workers get a
+        # store attached to the shared bus in post_fork
+        from app import create_app, get_assets
+        self.flask_app = create_app({'INVALIDATION_BUS': 'loopback'})
+        with self.flask_app.app_context():
+            # Build the pages before forking so workers share them copy-on-write
+            get_assets().build()
+        return self.flask_app
+
+    def post_fork(self, server, worker):
+        if self.bus_url:
+            from invalidation import create_bus
+            from store import PrinterStore
+            store = PrinterStore()
+            # Catch up with the running workers before taking requests
+            store.attach(create_bus(self.bus_url), sync_timeout=self.sync_timeout)
+            self.flask_app.extensions['printer_store'] = store
+
+    def worker_exit(self, server, worker):
+        store = self.flask_app.extensions.get('printer_store')
+        if store is not None and store.bus is not None:
+            store.bus.close()
+
+
+def main(argv=None):
+    """Run the production server."""
+    args = parse_args(argv)
+    if args.keep_store:
+        return keep_store(args.keep_store)
+    try:
+        bus_url, bus_dir = bus_url_for(args.workers, args.max_requests)
+    except ValueError as e:
+        sys.exit(f'serve.py: {e}')
+    Server(build_options(args), bus_url, bus_dir).run()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,263 @@
+"""
+Replicated in-memory store for printer profiles and job presets.
+Reads are served from local dicts; every mutation is version-stamped and
+published on an invalidation bus so the other replicas converge.
+"""
+import threading
+import time
+from datetime import datetime
+
+
+def default_profiles():
+    """
+    Build the printer profiles every replica starts with.
+
+    Returns:
+        dict of profiles keyed by id
+    """
+    return {
+        'default': {
+            # Sets no printer settings of its own, so it uses the global
+            # defaults and leaves presets in effect
+            'id': 'default',
+            'name': 'Default Profile',
+            'is_favorite': True,
+            'created_at': datetime.now().isoformat()
+        }
+    }
+
+
+def default_presets():
+    """
+    Build the job-specific presets every replica starts with.
+
+    Returns:
+        dict of presets keyed by id
+    """
+    return {
+        'draft_documents': {
+            'name': 'Draft Documents',
+            'paper_size': 'Letter',
+            'orientation': 'Portrait',
+            'color_mode': 'Grayscale',
+            'quality': 'Draft',
+            'duplex': True,
+            'copies': 1
+        },
+        'photo_quality': {
+            'name': 'Photo Quality',
+            'paper_size': 'Photo 4x6',
+            'orientation': 'Landscape',
+            'color_mode': 'Color',
+            'quality': 'High',
+            'duplex': False,
+            'copies': 1
+        },
+        'text_heavy': {
+            'name': 'Text Heavy',
+            'paper_size': 'Letter',
+            'orientation': 'Portrait',
+            'color_mode': 'Grayscale',
+            'quality': 'Standard',
+            'duplex': True,
+            'copies': 1
+        }
+    }
+
+
+class PrinterStore:
+    """
+    Local copy of the printer profiles and job presets tables.
+
+    A store attaching to a bus asks its peers to replay their changes; if no
+    replay finishes within resync_interval seconds it asks again, up to
+    sync_retries times, doubling the interval each time.
+
+    Args:
+        profiles (dict): Initial printer profiles keyed by id, defaults to
+            default_profiles()
+        presets (dict): Initial job presets keyed by id, defaults to
+            default_presets()
+        bus (InvalidationBus): Bus shared with the other replicas, optional
+    """
+
+    resync_interval = 0.5
+    sync_retries = 5
+
+    def __init__(self, profiles=None, presets=None, bus=None):
+        self.profiles = profiles if profiles is not None else default_profiles()
+        self.presets = presets if presets is not None else default_presets()
+        self._tables = {'profile': self.profiles, 'preset': self.presets}
+        self._versions = {}
+        self._clock = 0
+        self._lock = threading.RLock()
+        self._listeners = []
+        self._synced = threading.Event()
+        self.bus = None
+        if bus is not None:
+            self.attach(bus)
+
+    def attach(self, bus, sync_timeout=0):
+        """
+        Connect the store to an invalidation bus, replacing any previous one,
+        and ask the peers already on it to replay their changes.
+
+        Args:
+            bus (InvalidationBus): The bus to publish to and receive from
+            sync_timeout (float): Seconds to wait for a peer to finish its
+                replay before serving reads; 0 returns immediately
+
+        Returns:
+            True if a peer finished replaying within the timeout
+        """
+        if self.bus is not None:
+            self.bus.close()
+        self.bus = bus
+        self._synced.clear()
+        bus.subscribe(self.apply)
+        bus.publish({'op': 'sync', 'origin': bus.node_id})
+        if self._synced.wait(sync_timeout):
+            return True
+        if bus.peers():
+            threading.Thread(target=self._retry_sync, args=(bus,), daemon=True).start()
+        return False
+
+    def add_listener(self, callback):
+        """
+        Register a callback invoked with (kind, key) after any change,
+        local or received from a peer.
+
+        Args:
+            callback (callable): Function taking kind and key
+        """
+        self._listeners.append(callback)
+
+    def version(self, kind, key):
+        """
+        Get the version stamp of an entry.
+
+        Returns:
+            Tuple of (version, origin), or None if the entry was never changed
+        """
+        return self._versions.get((kind, key))
+
+    def put(self, kind, key, value):
+        """
+        Store an entry locally and publish the change.
+
+        Args:
+            kind (str): 'profile' or 'preset'
+            key (str): Entry id
+            value (dict): Entry contents
+
+        Raises:
+            EventTooLarge: If the entry is too large to publish; nothing
+                is stored
+        """
+        self._change(kind, key, 'put', value)
+
+    def delete(self, kind, key):
+        """
+        Remove an entry locally and publish the change.
+
+        Args:
+            kind (str): 'profile' or 'preset'
+            key (str): Entry id
+        """
+        self._change(kind, key, 'delete', None)
+
+    def apply(self, event):
+        """
+        Apply a change event received from a peer. Events older than the
+        local version of the same entry are ignored, so replicas converge
+        on the newest write whatever order events arrive in.
+
+        Args:
+            event (dict): The change event
+
+        Returns:
+            True if the event changed local state
+        """
+        if self.bus is not None and event.get('origin') == self.bus.node_id:
+            return False
+        if event['op'] == 'sync':
+            if self.bus is not None:
+                self._replay(event['origin'])
+            return False
+        if event['op'] == 'synced':
+            if self.bus is not None and event['target'] == self.bus.node_id:
+                self._synced.set()
+            return False
+        kind = event['kind']
+        key = event['key']
+        stamp = (event['version'], event['origin'])
+        with self._lock:
+            self._clock = max(self._clock, event['version'])
+            current = self._versions.get((kind, key))
+            if current is not None and current >= stamp:
+                return False
+            self._write(kind, key, event['op'], event.get('value'), stamp)
+        self._notify(kind, key)
+        return True
+
+    def _change(self, kind, key, op, value):
+        with self._lock:
+            # Hybrid clock: wall time, but never behind anything seen so far
+            clock = max(self._clock + 1, time.time_ns())
+            origin = self.bus.node_id if self.bus is not None else ''
+            event = {
+                'kind': kind,
+                'key': key,
+                'op': op,
+                'value': value,
+                'version': clock,
+                'origin': origin
+            }
+            if self.bus is not None:
+                # Refuse a change the peers could never receive
+                self.bus.check(event)
+            self._clock = clock
+            self._write(kind, key, op, value, (clock, origin))
+        if self.bus is not None:
+            self.bus.publish(event)
+        self._notify(kind, key)
+
+    def _retry_sync(self, bus):
+        interval = self.resync_interval
+        for _ in range(self.sync_retries):
+            if self._synced.wait(interval) or self.bus is not bus or not bus.peers():
+                return
+            bus.publish({'op': 'sync', 'origin': bus.node_id})
+            interval *= 2
+
+    def _replay(self, target):
+        # Sent from a thread of its own, so a bus listener never blocks on a
+        # peer that is itself busy replaying to this node
+        threading.Thread(target=self._send_replay, args=(self.bus, target), daemon=True).start()
+
+    def _send_replay(self, bus, target):
+        # Re-send every change we know of so a newly attached peer catches up
+        with self._lock:
+            events = [{
+                'kind': kind,
+                'key': key,
+                'op': 'put' if key in self._tables[kind] else 'delete',
+                'value': self._tables[kind].get(key),
+                'version': stamp[0],
+                'origin': stamp[1]
+            } for (kind, key), stamp in self._versions.items()]
+        events.append({'op': 'synced', 'target': target, 'origin': bus.node_id})
+        for event in events:
+            bus.publish(event, target=target)
+
+    def _write(self, kind, key, op, value, stamp):
+        table = self._tables[kind]
+        if op == 'delete':
+            table.pop(key, None)
+        else:
+            table[key] = value
+        self._versions[(kind, key)] = stamp
+
+    def _notify(self, kind, key):
+        for callback in list(self._listeners):
+            callback(kind, key)
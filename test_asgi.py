@@ -0,0 +1,185 @@
+"""
+Parity tests for the ASGI app
+Runs the test_api.py, test_printer.py, test_assets.py and test_resolve.py
+cases against asgi.py as well, so both apps are held to the same behavior.
+"""
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import httpx
+import pytest
+from starlette.testclient import TestClient
+import test_api
+import test_assets
+import test_printer
+import test_resolve
+from asgi import TEMPLATES_DIR, create_asgi_app
+from assets import AssetPipeline
+
+# Built once and shared, as the pages are the same for every app instance
+ASSETS = AssetPipeline(TEMPLATES_DIR).build()
+
+
+class ParityResponse:
+    """Expose a Starlette test response under the Flask response names"""
+
+    def __init__(self, response, data):
+        self.status_code = response.status_code
+        self.data = data
+        self.content_type = response.headers.get('content-type')
+        self.headers = response.headers
+
+
+class ParityClient:
+    """Mimic the subset of the Flask test client used by the API tests"""
+
+    def __init__(self, asgi_app):
+        self.client = TestClient(asgi_app)
+
+    def request(self, method, path, json=None, content_type=None, headers=None):
+        # httpx asks for compression by default; Flask's client does not
+        headers = dict({'Accept-Encoding': 'identity'}, **(headers or {}))
+        if content_type:
+            headers['Content-Type'] = content_type
+        # Read the raw body: like Flask's client, leave compressed bodies as sent
+        with self.client.stream(method, path, json=json, headers=headers) as response:
+            return ParityResponse(response, b''.join(response.iter_raw()))
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def put(self, path, **kwargs):
+        return self.request('PUT', path, **kwargs)
+
+    def delete(self, path, **kwargs):
+        return self.request('DELETE', path, **kwargs)
+
+
+class ParityApp:
+    """Stand-in for the Flask app whose test_client() talks to the ASGI app"""
+
+    def __init__(self):
+        self.asgi_app = create_asgi_app(assets=ASSETS)
+
+    def test_client(self):
+        return ParityClient(self.asgi_app)
+
+
+CASES = [(module, name)
+         for module in (test_api, test_printer, test_assets, test_resolve)
+         for name in dir(module)
+         if name.startswith('test_')]
+
+
+def run_against_asgi(module, name):
+    """Run one existing test case with its module's app swapped for the ASGI app"""
+    flask_app = module.app
+    module.app = ParityApp()
+    try:
+        getattr(module, name)()
+    finally:
+        module.app = flask_app
+
+
+@pytest.mark.parametrize('module,name', CASES,
+                         ids=[f'{module.__name__}.{name}' for module, name in CASES])
+def test_asgi_parity(module, name):
+    """Test that the ASGI app passes the existing API test case"""
+    run_against_asgi(module, name)
+
+
+def test_asgi_uses_injected_store():
+    """Test that the ASGI app serves from the store it is given"""
+    from store import PrinterStore
+    store = PrinterStore()
+    client = TestClient(create_asgi_app(store, ASSETS))
+
+    response = client.post('/printer/profiles', json={'name': 'Shared'})
+
+    assert response.status_code == 201, "Expected status code 201"
+    profile_id = response.json()['profile']['id']
+    assert store.profiles[profile_id]['name'] == 'Shared', "Profile should land in the injected store"
+
+
+def test_slow_bus_does_not_block_other_requests():
+    """Test that a profile change waiting on the bus leaves the event loop free"""
+    from invalidation import LoopbackBus
+    from store import PrinterStore
+
+    class SlowBus(LoopbackBus):
+        def publish(self, event, target=None):
+            time.sleep(0.5)
+            super().publish(event, target)
+
+    asgi_app = create_asgi_app(PrinterStore(bus=SlowBus()), ASSETS)
+    finished = []
+
+    async def send(client, method, path, **kwargs):
+        await client.request(method, path, **kwargs)
+        finished.append(path)
+
+    async def main():
+        transport = httpx.ASGITransport(app=asgi_app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            create = asyncio.create_task(send(client, 'POST', '/printer/profiles', json={'name': 'Slow'}))
+            await asyncio.sleep(0.05)
+            await send(client, 'GET', '/hello')
+            await create
+
+    asyncio.run(main())
+    assert finished == ['/hello', '/printer/profiles'], "Hello should not wait for the bus"
+
+
+def test_json_suffix_content_type():
+    """Test that application/*+json bodies are parsed, as Flask does"""
+    client = TestClient(create_asgi_app(assets=ASSETS))
+
+    response = client.post('/login', content=b'{"username": "a", "password": "b"}',
+                           headers={'Content-Type': 'application/vnd.api+json'})
+
+    assert response.status_code == 200, "Expected status code 200"
+
+
+def test_import_opens_no_bus():
+    """Test that importing asgi.py leaves the default app, and its bus, for first use"""
+    with tempfile.TemporaryDirectory() as directory:
+        script = ('import os, asgi; print(len(os.listdir(%r)));'
+                  'asgi.app; print(len(os.listdir(%r)))' % (directory, directory))
+        env = dict(os.environ, INVALIDATION_BUS=f'unix://{directory}')
+        result = subprocess.run([sys.executable, '-c', script], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                env=env, capture_output=True, text=True, check=True)
+
+    assert result.stdout.split() == ['0', '1'], "Bus should open on first access to asgi.app"
+
+
+if __name__ == "__main__":
+    try:
+        for module, name in CASES:
+            run_against_asgi(module, name)
+            print(f"✓ {module.__name__}.{name} passed against ASGI app")
+
+        test_asgi_uses_injected_store()
+        print("✓ test_asgi_uses_injected_store passed")
+
+        test_slow_bus_does_not_block_other_requests()
+        print("✓ test_slow_bus_does_not_block_other_requests passed")
+
+        test_json_suffix_content_type()
+        print("✓ test_json_suffix_content_type passed")
+
+        test_import_opens_no_bus()
+        print("✓ test_import_opens_no_bus passed")
+
+        print("\nAll ASGI parity tests passed!")
+    except AssertionError as e:
+        print(f"✗ Test failed: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"✗ Error running tests: {e}")
+        sys.exit(1)
@@ -0,0 +1,190 @@
+"""
+Test file for the asset pipeline
+Tests that inline CSS/JS is served as hashed, cacheable, compressed files.
+"""
+import gzip
+import os
+import re
+import sys
+import tempfile
+import threading
+from app import app
+from assets import IMMUTABLE, AssetPipeline, accepted_encodings
+
+
+def asset_urls(html):
+    """Find the stylesheet and script URLs in a page"""
+    return re.findall(r'(?:href|src)="(/assets/[^"]+)"', html.decode('utf-8'))
+
+
+def test_pages_have_no_inline_css_or_js():
+    """Test that the pages link to hashed files instead of inlining them"""
+    client = app.test_client()
+    response = client.get('/printer')
+
+    assert response.status_code == 200, "Expected status code 200"
+    assert b'<style>' not in response.data, "CSS should not be inline"
+    assert b'<script>' not in response.data, "JS should not be inline"
+    urls = asset_urls(response.data)
+    assert any(url.endswith('.css') for url in urls), "Page should link its stylesheet"
+    assert any(url.endswith('.js') for url in urls), "Page should link its script"
+
+
+def test_assets_are_immutable():
+    """Test that hashed assets can be cached forever"""
+    client = app.test_client()
+    page = client.get('/printer')
+
+    for url in asset_urls(page.data):
+        response = client.get(url)
+        assert response.status_code == 200, f"Expected status code 200 for {url}"
+        assert response.headers['Cache-Control'] == IMMUTABLE, "Asset should be immutable"
+        assert response.headers['Vary'] == 'Accept-Encoding', "Asset should vary by encoding"
+
+
+def test_asset_holds_page_css():
+    """Test that the extracted stylesheet is served as CSS"""
+    client = app.test_client()
+    url = [url for url in asset_urls(client.get('/welcome').data) if url.endswith('.css')][0]
+    response = client.get(url)
+
+    assert b'font-family' in response.data, "Stylesheet should hold the page CSS"
+    assert 'text/css' in response.content_type, "Stylesheet should be served as CSS"
+
+
+def test_gzip_negotiation():
+    """Test that a gzip-capable client gets the precompressed page"""
+    client = app.test_client()
+    response = client.get('/printer', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.headers['Content-Encoding'] == 'gzip', "Response should be gzipped"
+    assert b'Smart Printer Configuration' in gzip.decompress(response.data), "Page should decompress"
+
+
+def test_page_revalidates_with_etag():
+    """Test that a repeat visit with the ETag gets 304 Not Modified"""
+    client = app.test_client()
+    first = client.get('/welcome')
+    response = client.get('/welcome', headers={'If-None-Match': first.headers['ETag']})
+
+    assert response.status_code == 304, "Expected status code 304"
+    assert response.data == b'', "304 response should have no body"
+
+
+def test_etag_differs_per_encoding():
+    """Test that each content-coding of a page has its own ETag"""
+    client = app.test_client()
+    plain = client.get('/welcome')
+    gzipped = client.get('/welcome', headers={'Accept-Encoding': 'gzip'})
+
+    assert plain.headers['ETag'] != gzipped.headers['ETag'], "Codings should not share an ETag"
+
+    response = client.get('/welcome', headers={'Accept-Encoding': 'gzip',
+                                               'If-None-Match': plain.headers['ETag']})
+    assert response.status_code == 200, "Uncompressed ETag should not validate the gzip body"
+
+
+def test_weak_and_wildcard_etags_match():
+    """Test that W/ tags from recompressing proxies and '*' revalidate"""
+    client = app.test_client()
+    etag = client.get('/welcome').headers['ETag']
+
+    response = client.get('/welcome', headers={'If-None-Match': f'"other", W/{etag}'})
+    assert response.status_code == 304, "Weak tag should match"
+
+    response = client.get('/welcome', headers={'If-None-Match': '*'})
+    assert response.status_code == 304, "Wildcard should match"
+
+
+def test_unknown_asset():
+    """Test that a missing asset returns 404"""
+    client = app.test_client()
+    response = client.get('/assets/missing.0000.css')
+
+    assert response.status_code == 404, "Expected status code 404"
+
+
+def test_accepted_encodings():
+    """Test parsing of the Accept-Encoding header"""
+    assert accepted_encodings('gzip, deflate, br') == {'gzip', 'deflate', 'br'}, "Should list encodings"
+    assert accepted_encodings('br;q=0, gzip;q=0.8') == {'gzip'}, "q=0 should exclude an encoding"
+    assert accepted_encodings('') == set(), "Empty header accepts nothing"
+
+
+def test_concurrent_first_requests_find_assets():
+    """Test that assets requested while another thread builds them are found"""
+    templates = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+    names = list(AssetPipeline(templates).build().assets)
+    pipeline = AssetPipeline(templates)
+    start = threading.Barrier(8)
+    missing = []
+
+    def fetch(name):
+        start.wait()
+        if pipeline.asset(name) is None:
+            missing.append(name)
+
+    threads = [threading.Thread(target=fetch, args=(names[i % len(names)],)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert missing == [], f"Every asset should be found, missing {missing}"
+
+
+def test_write_built_files():
+    """Test writing the built files for a front-end server"""
+    templates = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+    pipeline = AssetPipeline(templates).build()
+    with tempfile.TemporaryDirectory() as directory:
+        pipeline.write(directory)
+        for name in pipeline.assets:
+            path = os.path.join(directory, 'assets', name)
+            assert os.path.exists(path), f"{name} should be written"
+            assert os.path.exists(path + '.gz'), f"{name} should have a gzip variant"
+        assert os.path.exists(os.path.join(directory, 'printer_config.html')), "Page should be written"
+
+
+if __name__ == "__main__":
+    try:
+        test_pages_have_no_inline_css_or_js()
+        print("✓ test_pages_have_no_inline_css_or_js passed")
+
+        test_assets_are_immutable()
+        print("✓ test_assets_are_immutable passed")
+
+        test_asset_holds_page_css()
+        print("✓ test_asset_holds_page_css passed")
+
+        test_gzip_negotiation()
+        print("✓ test_gzip_negotiation passed")
+
+        test_page_revalidates_with_etag()
+        print("✓ test_page_revalidates_with_etag passed")
+
+        test_etag_differs_per_encoding()
+        print("✓ test_etag_differs_per_encoding passed")
+
+        test_weak_and_wildcard_etags_match()
+        print("✓ test_weak_and_wildcard_etags_match passed")
+
+        test_unknown_asset()
+        print("✓ test_unknown_asset passed")
+
+        test_accepted_encodings()
+        print("✓ test_accepted_encodings passed")
+
+        test_concurrent_first_requests_find_assets()
+        print("✓ test_concurrent_first_requests_find_assets passed")
+
+        test_write_built_files()
+        print("✓ test_write_built_files passed")
+
+        print("\nAll asset tests passed!")
+    except AssertionError as e:
+        print(f"✗ Test failed: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"✗ Error running tests: {e}")
+        sys.exit(1)
@@ -0,0 +1,119 @@
+"""
+Test file for the app factory
+Tests that create_app() builds independent, lazily initialized apps.
+"""
+import sys
+from app import create_app, get_store
+from store import PrinterStore
+
+
+def test_apps_do_not_share_state():
+    """Test that a profile created in one app is not visible in another"""
+    first = create_app().test_client()
+    second = create_app().test_client()
+
+    first.post('/printer/profiles', json={'name': 'Only in first'})
+
+    names = [p['name'] for p in second.get('/printer/profiles').get_json()['profiles']]
+    assert 'Only in first' not in names, "Apps should not share profiles"
+
+
+def test_injected_store():
+    """Test that an app serves from the store it is given"""
+    store = PrinterStore()
+    client = create_app(store=store).test_client()
+
+    response = client.post('/printer/profiles', json={'name': 'Injected'})
+
+    assert response.status_code == 201, "Expected status code 201"
+    profile_id = response.get_json()['profile']['id']
+    assert store.profiles[profile_id]['name'] == 'Injected', "Profile should land in the injected store"
+
+
+def test_update_replaces_profile():
+    """Test that an update stores a new profile rather than editing the live one"""
+    store = PrinterStore()
+    client = create_app(store=store).test_client()
+    profile_id = client.post('/printer/profiles', json={'name': 'Before'}).get_json()['profile']['id']
+    before = store.profiles[profile_id]
+
+    client.put(f'/printer/profiles/{profile_id}', json={'name': 'After'})
+
+    assert before['name'] == 'Before', "Readers holding the old profile should not see a partial update"
+    assert store.profiles[profile_id]['name'] == 'After', "Store should hold the updated profile"
+
+
+def test_store_errors_are_not_reported_as_too_large():
+    """Test that only an oversized profile is answered with 413"""
+    class FailingStore(PrinterStore):
+        def put(self, kind, key, value):
+            raise ValueError('bad value')
+
+    client = create_app(store=FailingStore()).test_client()
+    client.application.testing = False
+
+    response = client.post('/printer/profiles', json={'name': 'Broken'})
+
+    assert response.status_code == 500, "Unrelated store errors should not become 413"
+
+
+def test_store_created_on_first_use():
+    """Test that the store is only created when a route needs it"""
+    app = create_app()
+    client = app.test_client()
+
+    client.get('/hello')
+    assert 'printer_store' not in app.extensions, "Hello route should not create the store"
+
+    client.get('/printer/profiles')
+    with app.app_context():
+        assert app.extensions['printer_store'] is get_store(), "Store should be created once"
+
+
+def test_route_groups_registered():
+    """Test that every route group is registered as a blueprint"""
+    app = create_app()
+
+    for name in ('hello', 'printer_ui', 'profiles', 'preview'):
+        assert name in app.blueprints, f"Blueprint {name} should be registered"
+
+
+def test_config_is_applied():
+    """Test that config passed to the factory reaches the app"""
+    app = create_app({'TESTING': True, 'INVALIDATION_BUS': 'loopback://factory-test'})
+
+    assert app.config['TESTING'] is True, "Config should be merged"
+    with app.app_context():
+        assert get_store().bus.channel == 'factory-test', "Store should use the configured bus"
+
+
+if __name__ == "__main__":
+    try:
+        test_apps_do_not_share_state()
+        print("✓ test_apps_do_not_share_state passed")
+
+        test_injected_store()
+        print("✓ test_injected_store passed")
+
+        test_update_replaces_profile()
+        print("✓ test_update_replaces_profile passed")
+
+        test_store_errors_are_not_reported_as_too_large()
+        print("✓ test_store_errors_are_not_reported_as_too_large passed")
+
+        test_store_created_on_first_use()
+        print("✓ test_store_created_on_first_use passed")
+
+        test_route_groups_registered()
+        print("✓ test_route_groups_registered passed")
+
+        test_config_is_applied()
+        print("✓ test_config_is_applied passed")
+
+        print("\nAll factory tests passed!")
+    except AssertionError as e:
+        print(f"✗ Test failed: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"✗ Error running tests: {e}")
+        sys.exit(1)
@@ -0,0 +1,304 @@
+"""
+Test file for the invalidation bus
+Tests that replicas converge on profile and preset changes.
+"""
+import socket
+import sys
+import tempfile
+import threading
+import time
+from invalidation import EventTooLarge, LoopbackBus, UnixSocketBus, create_bus, encode_frame
+from store import PrinterStore
+
+
+def wait_for(condition, timeout=1.0):
+    """Poll a condition until it holds or the timeout expires"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.001)
+    return condition()
+
+
+def test_loopback_put_and_delete():
+    """Test that a change on one replica reaches the other over loopback"""
+    first = PrinterStore(bus=LoopbackBus('test-loopback'))
+    second = PrinterStore(bus=LoopbackBus('test-loopback'))
+    try:
+        first.put('profile', 'p1', {'id': 'p1', 'name': 'Office'})
+        assert second.profiles['p1']['name'] == 'Office', "Replica should see new profile"
+        assert second.version('profile', 'p1') == first.version('profile', 'p1'), "Versions should match"
+
+        second.put('profile', 'p1', {'id': 'p1', 'name': 'Office 2'})
+        assert first.profiles['p1']['name'] == 'Office 2', "Update should flow back"
+
+        first.delete('profile', 'p1')
+        assert 'p1' not in second.profiles, "Delete should evict the replica's copy"
+    finally:
+        first.bus.close()
+        second.bus.close()
+
+
+def test_loopback_replicas_do_not_share_dicts():
+    """Test that replicas hold their own copy of each entry"""
+    first = PrinterStore(bus=LoopbackBus('test-copies'))
+    second = PrinterStore(bus=LoopbackBus('test-copies'))
+    try:
+        profile = {'id': 'p1', 'name': 'Office'}
+        first.put('profile', 'p1', profile)
+        profile['name'] = 'Changed locally'
+        assert second.profiles['p1']['name'] == 'Office', "Replica copy should be independent"
+    finally:
+        first.bus.close()
+        second.bus.close()
+
+
+def test_stale_event_is_ignored():
+    """Test that an older event does not overwrite a newer entry"""
+    store = PrinterStore(bus=LoopbackBus())
+    store.put('preset', 'draft', {'name': 'Newer'})
+    version, _ = store.version('preset', 'draft')
+
+    applied = store.apply({
+        'kind': 'preset',
+        'key': 'draft',
+        'op': 'put',
+        'value': {'name': 'Older'},
+        'version': version - 1,
+        'origin': 'peer'
+    })
+
+    assert not applied, "Stale event should be rejected"
+    assert store.presets['draft']['name'] == 'Newer', "Newer entry should be kept"
+
+
+def test_sync_without_bus_is_ignored():
+    """Test that a store with no bus ignores a request to replay"""
+    store = PrinterStore()
+
+    assert not store.apply({'op': 'sync', 'origin': 'peer'}), "Sync should not change state"
+
+
+def test_listener_called_for_remote_change():
+    """Test that listeners hear about changes received from peers"""
+    first = PrinterStore(bus=LoopbackBus('test-listener'))
+    second = PrinterStore(bus=LoopbackBus('test-listener'))
+    changes = []
+    second.add_listener(lambda kind, key: changes.append((kind, key)))
+    try:
+        first.put('preset', 'photo', {'name': 'Photo'})
+        assert changes == [('preset', 'photo')], "Listener should be notified"
+    finally:
+        first.bus.close()
+        second.bus.close()
+
+
+def test_new_replica_catches_up():
+    """Test that a replica joining late receives earlier changes"""
+    first = PrinterStore(bus=LoopbackBus('test-sync'))
+    try:
+        first.put('profile', 'p1', {'id': 'p1', 'name': 'Office'})
+        first.put('profile', 'p2', {'id': 'p2', 'name': 'Gone'})
+        first.delete('profile', 'p2')
+
+        second = PrinterStore({'p2': {'id': 'p2', 'name': 'Gone'}})
+        assert second.attach(LoopbackBus('test-sync'), sync_timeout=1), "Peer should finish its replay"
+        assert second.profiles['p1']['name'] == 'Office', "Late replica should receive the profile"
+        assert 'p2' not in second.profiles, "Late replica should apply the delete"
+        second.bus.close()
+    finally:
+        first.bus.close()
+
+
+def test_unretried_sync_is_asked_again():
+    """Test that a replica asks again when no peer answers its sync"""
+    peer_bus = LoopbackBus('test-resync')
+    second = PrinterStore()
+    second.resync_interval = 0.05
+    second.attach(LoopbackBus('test-resync'))
+    try:
+        # The peer only starts listening after the first sync went unanswered
+        first = PrinterStore()
+        first.put('profile', 'p1', {'id': 'p1', 'name': 'Office'})
+        first.attach(peer_bus)
+
+        assert wait_for(lambda: 'p1' in second.profiles), "Retried sync should be answered"
+    finally:
+        peer_bus.close()
+        second.bus.close()
+
+
+def test_unix_socket_catch_up_is_complete():
+    """Test that a late replica receives every entry, not just the first few"""
+    with tempfile.TemporaryDirectory() as directory:
+        first = PrinterStore(bus=UnixSocketBus(directory))
+        try:
+            for i in range(50):
+                first.put('profile', f'p{i}', {'id': f'p{i}', 'name': f'Profile {i}'})
+
+            second = PrinterStore()
+            assert second.attach(UnixSocketBus(directory), sync_timeout=2), "Peer should finish its replay"
+            assert sorted(second.profiles) == sorted(first.profiles), "Late replica should receive every profile"
+            second.bus.close()
+        finally:
+            first.bus.close()
+
+
+def test_unix_socket_replicas_converge():
+    """Test that replicas on the Unix socket bus converge quickly"""
+    with tempfile.TemporaryDirectory() as directory:
+        first = PrinterStore(bus=UnixSocketBus(directory))
+        second = PrinterStore(bus=UnixSocketBus(directory))
+        try:
+            first.put('profile', 'p1', {'id': 'p1', 'name': 'Office'})
+            assert wait_for(lambda: 'p1' in second.profiles), "Replica should receive the profile"
+
+            first.delete('profile', 'p1')
+            assert wait_for(lambda: 'p1' not in second.profiles), "Replica should drop the profile"
+
+            third = PrinterStore()
+            assert third.attach(UnixSocketBus(directory), sync_timeout=1), "Peers should answer the sync"
+            third.bus.close()
+        finally:
+            first.bus.close()
+            second.bus.close()
+
+
+def test_oversized_change_is_rejected():
+    """Test that a change too large to publish is not stored either"""
+    store = PrinterStore(bus=LoopbackBus())
+    try:
+        store.put('profile', 'big', {'id': 'big', 'name': 'x' * (2 << 20)})
+        assert False, "Oversized change should raise"
+    except EventTooLarge:
+        pass
+    assert 'big' not in store.profiles, "Rejected change should not be stored"
+
+
+def test_unix_socket_large_event():
+    """Test that events larger than a socket buffer still arrive whole"""
+    with tempfile.TemporaryDirectory() as directory:
+        first = PrinterStore(bus=UnixSocketBus(directory))
+        second = PrinterStore(bus=UnixSocketBus(directory))
+        try:
+            first.put('profile', 'p1', {'id': 'p1', 'name': 'x' * 300000})
+            assert wait_for(lambda: 'p1' in second.profiles), "Replica should receive the large profile"
+            assert len(second.profiles['p1']['name']) == 300000, "Profile should arrive whole"
+        finally:
+            first.bus.close()
+            second.bus.close()
+
+
+def test_unix_socket_survives_bad_events():
+    """Test that malformed or invalid events do not stop a node receiving"""
+    with tempfile.TemporaryDirectory() as directory:
+        first = PrinterStore(bus=UnixSocketBus(directory))
+        second = PrinterStore(bus=UnixSocketBus(directory))
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.connect(second.bus.path)
+                payload = b'not json'
+                sock.sendall(len(payload).to_bytes(4, 'big') + payload)
+                sock.sendall(encode_frame(['not', 'an', 'object']))
+                sock.sendall(encode_frame({'kind': 'printer', 'key': 'p0', 'op': 'put',
+                                           'value': {}, 'version': 1, 'origin': 'peer'}))
+                sock.sendall(encode_frame({'op': 'put'}))
+
+            first.put('profile', 'p1', {'id': 'p1', 'name': 'Office'})
+            assert wait_for(lambda: 'p1' in second.profiles), "Replica should keep receiving"
+        finally:
+            first.bus.close()
+            second.bus.close()
+
+
+def test_unix_socket_slow_peer_converges():
+    """Test that a peer too slow to take every event is resynced"""
+    with tempfile.TemporaryDirectory() as directory:
+        first = PrinterStore(bus=UnixSocketBus(directory))
+        first.bus.send_timeout = 0.1
+        first.bus.resync_delay = 0.1
+        second = PrinterStore(bus=UnixSocketBus(directory))
+        stalled = threading.Event()
+        second.bus.subscribe(lambda event: stalled.wait(5))
+        try:
+            for i in range(100):
+                first.put('profile', f'p{i}', {'id': f'p{i}', 'name': 'x' * 30000})
+            stalled.set()
+            assert wait_for(lambda: len(second.profiles) == len(first.profiles), timeout=5), \
+                "Slow replica should end up with every profile"
+        finally:
+            stalled.set()
+            first.bus.close()
+            second.bus.close()
+
+
+def test_create_bus_from_url():
+    """Test building buses from URLs"""
+    bus = create_bus('loopback')
+    assert isinstance(bus, LoopbackBus), "Should build a loopback bus"
+    bus.close()
+
+    with tempfile.TemporaryDirectory() as directory:
+        bus = create_bus(f'unix://{directory}')
+        assert isinstance(bus, UnixSocketBus), "Should build a Unix socket bus"
+        bus.close()
+
+    try:
+        create_bus('kafka://broker')
+        assert False, "Unknown scheme should raise"
+    except ValueError:
+        pass
+
+
+if __name__ == "__main__":
+    try:
+        test_loopback_put_and_delete()
+        print("✓ test_loopback_put_and_delete passed")
+
+        test_loopback_replicas_do_not_share_dicts()
+        print("✓ test_loopback_replicas_do_not_share_dicts passed")
+
+        test_stale_event_is_ignored()
+        print("✓ test_stale_event_is_ignored passed")
+
+        test_sync_without_bus_is_ignored()
+        print("✓ test_sync_without_bus_is_ignored passed")
+
+        test_listener_called_for_remote_change()
+        print("✓ test_listener_called_for_remote_change passed")
+
+        test_new_replica_catches_up()
+        print("✓ test_new_replica_catches_up passed")
+
+        test_unretried_sync_is_asked_again()
+        print("✓ test_unretried_sync_is_asked_again passed")
+
+        test_unix_socket_catch_up_is_complete()
+        print("✓ test_unix_socket_catch_up_is_complete passed")
+
+        test_unix_socket_replicas_converge()
+        print("✓ test_unix_socket_replicas_converge passed")
+
+        test_oversized_change_is_rejected()
+        print("✓ test_oversized_change_is_rejected passed")
+
+        test_unix_socket_large_event()
+        print("✓ test_unix_socket_large_event passed")
+
+        test_unix_socket_survives_bad_events()
+        print("✓ test_unix_socket_survives_bad_events passed")
+
+        test_unix_socket_slow_peer_converges()
+        print("✓ test_unix_socket_slow_peer_converges passed")
+
+        test_create_bus_from_url()
+        print("✓ test_create_bus_from_url passed")
+
+        print("\nAll invalidation tests passed!")
+    except AssertionError as e:
+        print(f"✗ Test failed: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"✗ Error running tests: {e}")
+        sys.exit(1)
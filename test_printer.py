@@ -29,6 +29,7 @@ def test_get_printer_profiles():
     assert 'profiles' in data, "Response should contain profiles"
     assert isinstance(data['profiles'], list), "Profiles should be a list"
     assert len(data['profiles']) > 0, "Should have at least one default profile"
+    assert all('paper_size' in p for p in data['profiles']), "Profiles should list every setting"
 
 
 def test_create_printer_profile():
@@ -113,6 +114,20 @@ def test_update_printer_profile():
     assert data['profile']['quality'] == 'High', "Quality should be updated"
 
 
+def test_create_oversized_profile():
+    """Test that a profile too large to replicate is rejected"""
+    client = app.test_client()
+    
+    response = client.post('/printer/profiles',
+                          json={'name': 'x' * (2 << 20)},
+                          content_type='application/json')
+    
+    assert response.status_code == 413, "Expected status code 413"
+    
+    data = json.loads(response.data)
+    assert data['status'] == 'error', "Status should be error"
+
+
 def test_update_nonexistent_profile():
     """Test updating a profile that doesn't exist"""
     client = app.test_client()
@@ -250,6 +265,9 @@ if __name__ == "__main__":
         test_update_printer_profile()
         print("✓ test_update_printer_profile passed")
         
+        test_create_oversized_profile()
+        print("✓ test_create_oversized_profile passed")
+        
         test_update_nonexistent_profile()
         print("✓ test_update_nonexistent_profile passed")
         
@@ -0,0 +1,274 @@
+"""
+Test file for effective-settings resolution
+Tests layering, memoization and invalidation, and the /printer/resolve API.
+"""
+import json
+import sys
+from app import app
+from invalidation import LoopbackBus
+from resolve import GLOBAL_DEFAULTS, ResolveError, SettingsResolver
+from store import PrinterStore
+
+
+def test_layers_apply_in_order():
+    """Test that defaults, preset, profile and overrides apply in that order"""
+    client = app.test_client()
+    response = client.post('/printer/profiles',
+                          json={'name': 'Office', 'quality': 'High'},
+                          content_type='application/json')
+    profile_id = json.loads(response.data)['profile']['id']
+
+    response = client.post('/printer/resolve',
+                          json={'profile_id': profile_id, 'preset_id': 'draft_documents',
+                                'overrides': {'copies': 5}},
+                          content_type='application/json')
+    settings = json.loads(response.data)['settings']
+
+    assert settings['color_mode'] == 'Grayscale', "Preset should apply where the profile sets nothing"
+    assert settings['quality'] == 'High', "Profile should override preset"
+    assert settings['copies'] == 5, "Overrides should win"
+    assert 'name' not in settings, "Only setting fields should be resolved"
+
+
+def test_defaults_only():
+    """Test resolving with no profile or preset"""
+    resolver = SettingsResolver(PrinterStore())
+
+    assert resolver.resolve() == GLOBAL_DEFAULTS, "Should resolve to the global defaults"
+
+
+def test_repeat_resolution_is_cached():
+    """Test that resolving the same layers twice is a cache hit"""
+    resolver = SettingsResolver(PrinterStore())
+
+    first = resolver.resolve('default', 'photo_quality')
+    second = resolver.resolve('default', 'photo_quality')
+
+    assert first == second, "Cached result should match"
+    assert (resolver.hits, resolver.misses) == (1, 1), "Second call should hit the cache"
+
+    first['copies'] = 99
+    assert resolver.resolve('default', 'photo_quality')['copies'] != 99, "Callers should get copies"
+
+
+def test_change_invalidates_only_dependents():
+    """Test that changing a profile evicts just the results built from it"""
+    store = PrinterStore()
+    resolver = SettingsResolver(store)
+    resolver.resolve('default', 'text_heavy')
+    resolver.resolve(None, 'text_heavy')
+
+    store.put('profile', 'default', dict(store.profiles['default'], quality='Draft'))
+
+    assert resolver.resolve('default', 'text_heavy')['quality'] == 'Draft', "Should see the change"
+    resolver.resolve(None, 'text_heavy')
+    assert resolver.hits == 1, "Result without the profile should stay cached"
+
+
+def test_peer_change_invalidates():
+    """Test that a change received from another replica evicts cached results"""
+    first = PrinterStore(bus=LoopbackBus('test-resolve'))
+    second = PrinterStore(bus=LoopbackBus('test-resolve'))
+    resolver = SettingsResolver(second)
+    try:
+        assert resolver.resolve(None, 'draft_documents')['copies'] == 1, "Should start from the preset"
+
+        first.put('preset', 'draft_documents', dict(first.presets['draft_documents'], copies=3))
+
+        assert resolver.resolve(None, 'draft_documents')['copies'] == 3, "Should see the peer's change"
+    finally:
+        first.bus.close()
+        second.bus.close()
+
+
+def test_cache_is_bounded():
+    """Test that the least recently used results are dropped"""
+    resolver = SettingsResolver(PrinterStore(), max_entries=2)
+
+    for copies in (1, 2, 3):
+        resolver.resolve(overrides={'copies': copies})
+
+    assert len(resolver._cache) == 2, "Cache should hold at most max_entries"
+
+
+def test_override_types_are_not_mixed():
+    """Test that equal values of different types do not share a result"""
+    resolver = SettingsResolver(PrinterStore())
+
+    resolver.resolve(overrides={'duplex': 1, 'copies': 2.0})
+    settings = resolver.resolve(overrides={'duplex': True, 'copies': 2})
+
+    assert settings['duplex'] is True, "Boolean override should not come back as 1"
+    assert type(settings['copies']) is int, "Integer override should not come back as 2.0"
+
+
+def test_unknown_preset():
+    """Test that resolving an unknown preset fails"""
+    resolver = SettingsResolver(PrinterStore())
+    try:
+        resolver.resolve(preset_id='missing')
+        assert False, "Unknown preset should raise"
+    except ResolveError as e:
+        assert str(e) == 'Preset not found', "Error should name the preset"
+
+
+def test_resolve_endpoint():
+    """Test resolving one profile and preset pair"""
+    client = app.test_client()
+    response = client.post('/printer/resolve',
+                          json={'profile_id': 'default', 'preset_id': 'photo_quality',
+                                'overrides': {'copies': 3}},
+                          content_type='application/json')
+
+    assert response.status_code == 200, "Expected status code 200"
+
+    data = json.loads(response.data)
+    assert data['status'] == 'success', "Status should be success"
+    assert data['settings']['paper_size'] == 'Photo 4x6', "Default profile should leave the preset in effect"
+    assert data['settings']['copies'] == 3, "Overrides should apply"
+
+
+def test_profile_lists_inherited_settings():
+    """Test that profiles say which settings they leave to presets and defaults"""
+    client = app.test_client()
+    response = client.post('/printer/profiles',
+                          json={'name': 'Office', 'quality': 'High'},
+                          content_type='application/json')
+    profile = json.loads(response.data)['profile']
+
+    assert 'quality' not in profile['inherited'], "Set setting should not be inherited"
+    assert 'paper_size' in profile['inherited'], "Unset setting should be inherited"
+    assert profile['paper_size'] == GLOBAL_DEFAULTS['paper_size'], "Unset setting should show the default"
+
+
+def test_null_clears_profile_setting():
+    """Test that updating a setting to null makes the profile inherit it again"""
+    client = app.test_client()
+    response = client.post('/printer/profiles',
+                          json={'name': 'Office', 'quality': 'High'},
+                          content_type='application/json')
+    profile_id = json.loads(response.data)['profile']['id']
+
+    response = client.put(f'/printer/profiles/{profile_id}',
+                         json={'quality': None},
+                         content_type='application/json')
+    assert 'quality' in json.loads(response.data)['profile']['inherited'], "Cleared setting should be inherited"
+
+    response = client.post('/printer/resolve',
+                          json={'profile_id': profile_id, 'preset_id': 'draft_documents'},
+                          content_type='application/json')
+    assert json.loads(response.data)['settings']['quality'] == 'Draft', "Preset should supply the cleared setting"
+
+
+def test_resolve_endpoint_bulk():
+    """Test resolving many pairs in one call"""
+    client = app.test_client()
+    response = client.post('/printer/resolve',
+                          json={'items': [{'preset_id': 'draft_documents'},
+                                          {'preset_id': 'missing'}]},
+                          content_type='application/json')
+
+    assert response.status_code == 200, "Expected status code 200"
+
+    data = json.loads(response.data)
+    assert len(data['results']) == 2, "Should have one result per item"
+    assert data['results'][0]['settings']['quality'] == 'Draft', "First item should resolve"
+    assert data['results'][1]['status'] == 'error', "Unknown preset should fail on its own"
+    assert [r['status_code'] for r in data['results']] == [200, 404], "Each item should carry its status code"
+
+
+def test_resolve_endpoint_errors():
+    """Test that bad resolve requests are rejected"""
+    client = app.test_client()
+
+    response = client.post('/printer/resolve',
+                          json={'profile_id': 'nonexistent'},
+                          content_type='application/json')
+    assert response.status_code == 404, "Unknown profile should return 404"
+
+    response = client.post('/printer/resolve',
+                          json={'overrides': {'toner': 'Max'}},
+                          content_type='application/json')
+    assert response.status_code == 400, "Unknown setting should return 400"
+
+    response = client.post('/printer/resolve',
+                          json={},
+                          content_type='application/json')
+    assert response.status_code == 400, "Empty body should return 400"
+
+    response = client.post('/printer/resolve',
+                          json=['x'],
+                          content_type='application/json')
+    assert response.status_code == 400, "Body that is not an object should return 400"
+
+    response = client.post('/printer/preview',
+                          json=['x'],
+                          content_type='application/json')
+    assert response.status_code == 400, "Preview body that is not an object should return 400"
+
+
+def test_preview_from_preset():
+    """Test that a preview can start from a preset"""
+    client = app.test_client()
+    response = client.post('/printer/preview',
+                          json={'preset_id': 'photo_quality', 'copies': 2},
+                          content_type='application/json')
+
+    assert response.status_code == 200, "Expected status code 200"
+
+    data = json.loads(response.data)
+    assert data['preview']['paper_size'] == 'Photo 4x6', "Preview should use the preset"
+    assert data['preview']['copies'] == 2, "Request fields should override the preset"
+
+
+if __name__ == "__main__":
+    try:
+        test_layers_apply_in_order()
+        print("✓ test_layers_apply_in_order passed")
+
+        test_defaults_only()
+        print("✓ test_defaults_only passed")
+
+        test_repeat_resolution_is_cached()
+        print("✓ test_repeat_resolution_is_cached passed")
+
+        test_change_invalidates_only_dependents()
+        print("✓ test_change_invalidates_only_dependents passed")
+
+        test_peer_change_invalidates()
+        print("✓ test_peer_change_invalidates passed")
+
+        test_cache_is_bounded()
+        print("✓ test_cache_is_bounded passed")
+
+        test_override_types_are_not_mixed()
+        print("✓ test_override_types_are_not_mixed passed")
+
+        test_unknown_preset()
+        print("✓ test_unknown_preset passed")
+
+        test_resolve_endpoint()
+        print("✓ test_resolve_endpoint passed")
+
+        test_profile_lists_inherited_settings()
+        print("✓ test_profile_lists_inherited_settings passed")
+
+        test_null_clears_profile_setting()
+        print("✓ test_null_clears_profile_setting passed")
+
+        test_resolve_endpoint_bulk()
+        print("✓ test_resolve_endpoint_bulk passed")
+
+        test_resolve_endpoint_errors()
+        print("✓ test_resolve_endpoint_errors passed")
+
+        test_preview_from_preset()
+        print("✓ test_preview_from_preset passed")
+
+        print("\nAll resolve tests passed!")
+    except AssertionError as e:
+        print(f"✗ Test failed: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"✗ Error running tests: {e}")
+        sys.exit(1)
@@ -0,0 +1,190 @@
+"""
+Test file for the production server settings
+Tests that serve.py turns its options into the expected gunicorn settings.
+"""
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from gunicorn.workers.gthread import ThreadWorker
+from serve import build_options, bus_url_for, parse_args
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def free_port():
+    """Find a port nothing is listening on"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(*options):
+    """Run serve.py on a free port and wait until it answers"""
+    base = f'http://127.0.0.1:{free_port()}'
+    server = subprocess.Popen([sys.executable, 'serve.py', '--bind', base[len('http://'):],
+                               '--max-requests-jitter', '0', *options],
+                              cwd=HERE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(base + '/hello', timeout=1):
+                return server, base
+        except OSError:
+            time.sleep(0.1)
+    stop_server(server)
+    raise AssertionError("Server should start")
+
+
+def stop_server(server):
+    """Shut a server down gracefully"""
+    server.terminate()
+    server.wait(30)
+
+
+def request_json(url, body=None):
+    """Send a GET, or a POST when there is a body, and decode the JSON reply"""
+    data = json.dumps(body).encode('utf-8') if body is not None else None
+    request = urllib.request.Request(url, data=data, headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=5) as response:
+        return json.loads(response.read())
+
+
+def test_default_options():
+    """Test the defaults used when nothing is configured"""
+    options = build_options(parse_args([]))
+
+    assert issubclass(options['worker_class'], ThreadWorker), "Workers should be threaded"
+    assert options['preload_app'] is True, "App should be loaded before forking"
+    assert options['max_requests'] > 0, "Workers should be recycled"
+    assert options['max_requests_jitter'] > 0, "Recycling should be spread out"
+    assert options['keepalive'] > 0, "Keep-alive should be enabled"
+
+
+def test_command_line_options():
+    """Test that command line options reach gunicorn"""
+    args = parse_args(['--bind', '127.0.0.1:9000', '--workers', '3', '--threads', '8',
+                       '--max-requests', '500', '--keepalive', '2'])
+    options = build_options(args)
+
+    assert options['bind'] == '127.0.0.1:9000', "Bind address should match"
+    assert options['workers'] == 3, "Worker count should match"
+    assert options['threads'] == 8, "Thread count should match"
+    assert options['max_requests'] == 500, "Max requests should match"
+    assert options['keepalive'] == 2, "Keep-alive should match"
+
+
+def test_environment_options():
+    """Test that environment variables are used as defaults"""
+    saved = dict(os.environ)
+    try:
+        os.environ['PORT'] = '9100'
+        os.environ['WEB_CONCURRENCY'] = '5'
+        options = build_options(parse_args([]))
+    finally:
+        os.environ.clear()
+        os.environ.update(saved)
+
+    assert options['bind'] == '0.0.0.0:9100', "PORT should set the bind address"
+    assert options['workers'] == 5, "WEB_CONCURRENCY should set the worker count"
+
+
+def test_bus_for_several_workers():
+    """Test that workers get a shared bus unless there is one that is never recycled"""
+    saved = os.environ.pop('INVALIDATION_BUS', None)
+    try:
+        assert bus_url_for(1) == (None, None), "One worker that is never recycled needs no bus"
+
+        url, directory = bus_url_for(4)
+        assert url == 'unix://' + directory, "Workers should share a Unix socket bus"
+        shutil.rmtree(directory)
+
+        url, directory = bus_url_for(1, max_requests=100)
+        assert url == 'unix://' + directory, "A recycled worker should catch up over a bus"
+        shutil.rmtree(directory)
+
+        os.environ['INVALIDATION_BUS'] = 'unix:///srv/bus'
+        assert bus_url_for(4) == ('unix:///srv/bus', None), "Explicit bus should win"
+
+        os.environ['INVALIDATION_BUS'] = 'loopback'
+        try:
+            bus_url_for(1, max_requests=100)
+            assert False, "In-process bus should be refused when workers recycle"
+        except ValueError:
+            pass
+    finally:
+        os.environ.pop('INVALIDATION_BUS', None)
+        if saved is not None:
+            os.environ['INVALIDATION_BUS'] = saved
+
+
+def test_recycling_drops_no_requests():
+    """Test that recycling workers under load does not fail any request"""
+    server, base = start_server('--workers', '2', '--threads', '2', '--max-requests', '20')
+    failures = []
+
+    def send_requests():
+        for _ in range(50):
+            try:
+                with urllib.request.urlopen(base + '/hello', timeout=5) as response:
+                    if response.status != 200:
+                        failures.append(response.status)
+            except OSError as e:
+                failures.append(e)
+
+    try:
+        clients = [threading.Thread(target=send_requests) for _ in range(4)]
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+    finally:
+        stop_server(server)
+
+    assert failures == [], f"Recycled workers should finish every request, got {failures[:3]}"
+
+
+def test_recycled_worker_keeps_profiles():
+    """Test that a single worker recycled after a few requests keeps new profiles"""
+    server, base = start_server('--workers', '1', '--max-requests', '5')
+    try:
+        for i in range(3):
+            request_json(base + '/printer/profiles', {'name': f'Kept {i}'})
+        counts = {len(request_json(base + '/printer/profiles')['profiles']) for _ in range(12)}
+    finally:
+        stop_server(server)
+
+    assert counts == {4}, f"Every recycled worker should see all profiles, saw {sorted(counts)}"
+
+if __name__ == "__main__":
+    try:
+        test_default_options()
+        print("✓ test_default_options passed")
+
+        test_command_line_options()
+        print("✓ test_command_line_options passed")
+
+        test_environment_options()
+        print("✓ test_environment_options passed")
+
+        test_bus_for_several_workers()
+        print("✓ test_bus_for_several_workers passed")
+
+        test_recycling_drops_no_requests()
+        print("✓ test_recycling_drops_no_requests passed")
+
+        test_recycled_worker_keeps_profiles()
+        print("✓ test_recycled_worker_keeps_profiles passed")
+
+        print("\nAll serve tests passed!")
+    except AssertionError as e:
+        print(f"✗ Test failed: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"✗ Error running tests: {e}")
+        sys.exit(1)
@@ -0,0 +1,40 @@
+"""
+Test file for startup time
+Holds cold starts to the budget in bench_startup.py.
+"""
+import sys
+from bench_startup import budget, measure_startup, probe
+
+
+def test_create_app_defers_subsystems():
+    """Test that building an app loads no store, bus or asset pipeline"""
+    eager = probe()['eager_modules']
+
+    assert eager == [], f"create_app() should not load {eager}"
+
+
+def test_startup_within_budget():
+    """Test that import, create_app and first requests stay within budget"""
+    results = measure_startup(runs=3)
+    limits = budget()
+
+    for phase, seconds in results.items():
+        assert seconds <= limits[phase], \
+            f"{phase} took {seconds * 1000:.0f} ms, budget is {limits[phase] * 1000:.0f} ms"
+
+
+if __name__ == "__main__":
+    try:
+        test_create_app_defers_subsystems()
+        print("✓ test_create_app_defers_subsystems passed")
+
+        test_startup_within_budget()
+        print("✓ test_startup_within_budget passed")
+
+        print("\nAll startup tests passed!")
+    except AssertionError as e:
+        print(f"✗ Test failed: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"✗ Error running tests: {e}")
+        sys.exit(1)